@@ -1,12 +1,16 @@
-"""Paquete principal de aemetdata."""
+"""Paquete principal de aemetdata.
 
+Los subpaquetes (y con ellos ``httpx`` y el resto de dependencias) se
+importan la primera vez que se accede a ellos, de modo que ``import
+aemetdata`` y la CLI arrancan sin coste.
+"""
 
-from .aemet_client import AemetClient
-from . import avisos
-from . import climatologia
-from . import imagenes
-from . import observaciones
-from . import utils
+import importlib
+
+
+_ATRIBUTOS_PEREZOSOS = {
+	"AemetClient": ".aemet_client",
+}
 
 __all__ = [
 	"AemetClient",
@@ -14,6 +18,21 @@ __all__ = [
 	"climatologia",
 	"imagenes",
 	"observaciones",
+	"predicciones",
 	"utils",
 ]
 
+
+def __getattr__(nombre):
+	if nombre in _ATRIBUTOS_PEREZOSOS:
+		valor = getattr(importlib.import_module(_ATRIBUTOS_PEREZOSOS[nombre], __name__), nombre)
+	elif nombre in __all__:
+		valor = importlib.import_module(f".{nombre}", __name__)
+	else:
+		raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
+	globals()[nombre] = valor
+	return valor
+
+
+def __dir__():
+	return sorted(set(globals()) | set(__all__))
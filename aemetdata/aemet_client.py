@@ -1,5 +1,4 @@
 """Cliente principal para AEMET OpenData."""
-import httpx
 
 class AemetClient:
     def __init__(self, api_key=None):
@@ -9,6 +8,8 @@ class AemetClient:
         """Descarga datos de un endpoint de AEMET OpenData."""
         # Esta es una implementación mínima de ejemplo.
         # En la versión real, deberías gestionar la autenticación y la descarga real.
+        import httpx
+
         url = f"https://opendata.aemet.es/opendata/api/{endpoint}"
         headers = {"accept": "application/json"}
         if self.api_key:
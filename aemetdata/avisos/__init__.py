@@ -5,14 +5,16 @@ from __future__ import annotations
 
 from typing import Iterable
 
-import httpx
-from datetime import datetime
-import httpx
+import re
+from datetime import datetime, timedelta
 from ..utils.suport_functions import (
     fetch_con_reintentos_endpoint_aemet,
+    fetch_bytes_url,
     descargar_archivo_tar_gz,
     AemetError,
 )
+from ..utils.perfilado import anotar_peticion, en_unidad, medir
+from ..utils.pipeline import iterar_pipeline
 
 
 # Códigos de área válidos para AEMET
@@ -40,6 +42,76 @@ AREA_CODES = {
 }
 
 
+def _unidad_avisos_area(area):
+    endpoint_template = (
+        f"https://opendata.aemet.es/opendata/api/avisos_cap/ultimoelaborado/area/{area}"
+        "?api_key={apiKey}"
+    )
+    return (
+        endpoint_template,
+        f"avisos_area_{area}",
+        f"avisos para área {area} ({AREA_CODES[area]})",
+    )
+
+
+def _unidades_avisos_fechas(fecha_inicio, fecha_fin):
+    """Unidades de trabajo (una por día) y nombres de archivo para un rango de fechas."""
+    formato_fecha_completa = r"^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}UTC$"
+    formato_fecha_simple = r"^\d{4}-\d{2}-\d{2}$"
+
+    def completar_fecha(fecha: str, inicio: bool) -> str:
+        if re.match(formato_fecha_completa, fecha):
+            return fecha
+        elif re.match(formato_fecha_simple, fecha):
+            return f"{fecha}T00:00:00UTC" if inicio else f"{fecha}T23:59:59UTC"
+        else:
+            raise ValueError(
+                f"La fecha '{fecha}' debe estar en formato 'AAAA-MM-DD' o 'AAAA-MM-DDTHH:MM:SSUTC'."
+            )
+
+    fecha_inicio = completar_fecha(fecha_inicio, True)
+    fecha_fin = completar_fecha(fecha_fin, False)
+
+    def parse_fecha(fecha):
+        if 'T' in fecha:
+            return datetime.strptime(fecha, '%Y-%m-%dT%H:%M:%SUTC')
+        return datetime.strptime(fecha, '%Y-%m-%d')
+
+    dt_inicio = parse_fecha(fecha_inicio)
+    dt_fin = parse_fecha(fecha_fin)
+
+    def generar_intervalos(dt_inicio, dt_fin):
+        intervalos = []
+        actual = dt_inicio
+        while actual <= dt_fin:
+            siguiente = actual + timedelta(days=1)
+            if siguiente > dt_fin:
+                siguiente = dt_fin
+            intervalos.append((actual, siguiente))
+            actual = siguiente + timedelta(days=1)
+        return intervalos
+
+    intervalos = generar_intervalos(dt_inicio, dt_fin)
+    
+    unidades = []
+    nombres = []
+    for intervalo_inicio, intervalo_fin in intervalos:
+        fecha_ini_str = intervalo_inicio.strftime('%Y-%m-%dT00:00:00UTC')
+        fecha_fin_str = intervalo_fin.strftime('%Y-%m-%dT23:59:59UTC')
+        endpoint_template = (
+            f"https://opendata.aemet.es/opendata/api/avisos_cap/archivo/"
+            f"fechaini/{fecha_ini_str}/fechafin/{fecha_fin_str}"
+            "?api_key={apiKey}"
+        )
+        unidades.append((
+            endpoint_template,
+            f"avisos_fechas_{fecha_ini_str}_{fecha_fin_str}",
+            f"avisos CAP desde {fecha_ini_str} a {fecha_fin_str}",
+        ))
+        nombres.append(f"avisos_{fecha_ini_str[:10]}_{fecha_fin_str[:10]}.tar.gz")
+    return unidades, nombres
+
+
 async def avisos_area_ultimo_eleaborado(area: str, api_keys: Iterable[str]):
     
     """Descarga los avisos del último elaborado para un área específica.
@@ -90,18 +162,16 @@ async def avisos_area_ultimo_eleaborado(area: str, api_keys: Iterable[str]):
     if not api_keys_list:
         raise ValueError("Se requiere al menos una API key en 'api_keys'.")
 
-    endpoint_template = (
-        f"https://opendata.aemet.es/opendata/api/avisos_cap/ultimoelaborado/area/{area}"
-        "?api_key={apiKey}"
-    )
+    endpoint_template, tipo, _ = _unidad_avisos_area(area)
 
     # Paso 1: Obtener la URL del archivo tar.gz
     print(f"🔍 Solicitando avisos para área {area} ({AREA_CODES[area]})")
-    response = await fetch_con_reintentos_endpoint_aemet(
-        endpoint_template,
-        tipo=f"avisos_area_{area}",
-        api_keys=api_keys_list,
-    )
+    with en_unidad(tipo), medir("metadatos"):
+        response = await fetch_con_reintentos_endpoint_aemet(
+            endpoint_template,
+            tipo=tipo,
+            api_keys=api_keys_list,
+        )
     
     # Paso 2: Validar respuesta
     if not isinstance(response, dict):
@@ -118,12 +188,16 @@ async def avisos_area_ultimo_eleaborado(area: str, api_keys: Iterable[str]):
         raise AemetError("No se encontró URL de descarga en la respuesta de AEMET")
     
     # Paso 3: Descargar archivo tar.gz y guardarlo en disco
+    import httpx
+
     print(f"✨ Descargando archivo tar.gz de avisos CAP desde URL de AEMET")
     async with httpx.AsyncClient() as client:
-        resp = await client.get(datos_url, timeout=30)
+        with en_unidad(tipo), medir("descarga"):
+            resp = await client.get(datos_url, timeout=30)
+            anotar_peticion(bytes_datos=len(resp.content))
         resp.raise_for_status()
         filename = f"avisos_area_{area}_{datetime.now().strftime('%Y%m%d%H%M%S')}.tar.gz"
-        with open(filename, "wb") as f:
+        with medir("fusion", unidad=tipo), open(filename, "wb") as f:
             f.write(resp.content)
         return filename
 
@@ -132,6 +206,8 @@ async def avisos_por_fechas(
     fecha_inicio: str,
     fecha_fin: str,
     api_keys: Iterable[str],
+    workers_metadatos: int = 1,
+    workers_descargas: int = 1,
 ) -> dict:
     """Descarga los avisos CAP en un rango de fechas específico.
     
@@ -139,6 +215,9 @@ async def avisos_por_fechas(
         fecha_inicio: Fecha de inicio en formato ISO (ej: 2026-01-01 o 2026-01-01T00:00:00UTC).
         fecha_fin: Fecha de fin en formato ISO (ej: 2026-01-31 o 2026-01-31T23:59:59UTC).
         api_keys: Iterable con las claves API de AEMET.
+        workers_metadatos: Consultas de metadatos simultáneas.
+        workers_descargas: Descargas de archivos simultáneas. Las dos etapas
+            se solapan: se resuelven metadatos mientras se descargan archivos.
         
     Returns:
         dict: Datos extraídos con los avisos CAP en el rango de fechas.
@@ -155,8 +234,6 @@ async def avisos_por_fechas(
         ...     ["tu_api_key"]
         ... )
     """
-    from datetime import datetime
-    
     api_keys_list = list(api_keys)
     if not api_keys_list:
         raise ValueError("Se requiere al menos una API key en 'api_keys'.")
@@ -165,81 +242,19 @@ async def avisos_por_fechas(
     if not fecha_inicio or not fecha_fin:
         raise ValueError("Los parámetros 'fecha_inicio' y 'fecha_fin' son obligatorios.")
 
-    import re
-    formato_fecha_completa = r"^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}UTC$"
-    formato_fecha_simple = r"^\d{4}-\d{2}-\d{2}$"
+    unidades, nombres = _unidades_avisos_fechas(fecha_inicio, fecha_fin)
 
-    def completar_fecha(fecha: str, inicio: bool) -> str:
-        if re.match(formato_fecha_completa, fecha):
-            return fecha
-        elif re.match(formato_fecha_simple, fecha):
-            return f"{fecha}T00:00:00UTC" if inicio else f"{fecha}T23:59:59UTC"
-        else:
-            raise ValueError(
-                f"La fecha '{fecha}' debe estar en formato 'AAAA-MM-DD' o 'AAAA-MM-DDTHH:MM:SSUTC'."
-            )
-
-    fecha_inicio = completar_fecha(fecha_inicio, True)
-    fecha_fin = completar_fecha(fecha_fin, False)
-
-    from datetime import datetime, timedelta
-    def parse_fecha(fecha):
-        if 'T' in fecha:
-            return datetime.strptime(fecha, '%Y-%m-%dT%H:%M:%SUTC')
-        return datetime.strptime(fecha, '%Y-%m-%d')
-
-    dt_inicio = parse_fecha(fecha_inicio)
-    dt_fin = parse_fecha(fecha_fin)
-
-    def generar_intervalos(dt_inicio, dt_fin):
-        intervalos = []
-        actual = dt_inicio
-        while actual <= dt_fin:
-            siguiente = actual + timedelta(days=1)
-            if siguiente > dt_fin:
-                siguiente = dt_fin
-            intervalos.append((actual, siguiente))
-            actual = siguiente + timedelta(days=1)
-        return intervalos
-
-    intervalos = generar_intervalos(dt_inicio, dt_fin)
-    
-    archivos = []
     rutas = []
-    for intervalo_inicio, intervalo_fin in intervalos:
-        fecha_ini_str = intervalo_inicio.strftime('%Y-%m-%dT00:00:00UTC')
-        fecha_fin_str = intervalo_fin.strftime('%Y-%m-%dT23:59:59UTC')
-        endpoint_template = (
-            f"https://opendata.aemet.es/opendata/api/avisos_cap/archivo/"
-            f"fechaini/{fecha_ini_str}/fechafin/{fecha_fin_str}"
-            "?api_key={apiKey}"
-        )
-        print(f"🔍 Solicitando avisos CAP desde {fecha_ini_str} a {fecha_fin_str}")
-        response = await fetch_con_reintentos_endpoint_aemet(
-            endpoint_template,
-            tipo=f"avisos_fechas_{fecha_ini_str}_{fecha_fin_str}",
-            api_keys=api_keys_list,
-        )
-        if not isinstance(response, dict):
-            raise AemetError(f"Respuesta inesperada de AEMET: {response}")
-        if response.get("estado") != 200:
-            raise AemetError(
-                f"Error en AEMET: {response.get('descripcion', 'Error desconocido')} "
-                f"(estado: {response.get('estado')})"
-            )
-        datos_url = response.get("datos")
-        if not datos_url:
-            raise AemetError("No se encontró URL de descarga en la respuesta de AEMET")
-        print(f"✨ Descargando archivo tar.gz de avisos CAP desde URL de AEMET")
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(datos_url, timeout=30)
-            resp.raise_for_status()
-            filename = f"avisos_{fecha_ini_str[:10]}_{fecha_fin_str[:10]}.tar.gz"
-            with open(filename, "wb") as f:
-                f.write(resp.content)
-            rutas.append(filename)
+    async for indice, contenido in iterar_pipeline(
+        unidades,
+        api_keys_list,
+        descargar=fetch_bytes_url,
+        workers_metadatos=workers_metadatos,
+        workers_descargas=workers_descargas,
+        ordenado=True,
+    ):
+        filename = nombres[indice]
+        with medir("fusion", unidad=unidades[indice][1]), open(filename, "wb") as f:
+            f.write(contenido)
+        rutas.append(filename)
     return rutas
-
-
-
-
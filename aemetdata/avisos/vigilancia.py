@@ -0,0 +1,188 @@
+"""Vigilancia de los últimos avisos por área con detección de cambios.
+
+Consultar :func:`avisos_area_ultimo_eleaborado` periódicamente para todas
+las áreas descarga y guarda un ``.tar.gz`` nuevo en cada llamada aunque no
+haya cambiado nada. :func:`vigilar_avisos` consulta todas las áreas a la vez,
+calcula un hash del contenido de cada archivo y solo entrega (y guarda) los
+avisos CAP nuevos, sin repetir identificadores entre áreas ni entre
+consultas.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import xml.etree.ElementTree as ET
+from datetime import datetime, timedelta
+from typing import Iterable
+
+from ..utils.pipeline import iterar_pipeline
+from ..utils.suport_functions import descargar_archivo_tar_gz
+from . import AREA_CODES, _unidad_avisos_area
+
+
+def _hash_contenido(archivos: dict) -> str:
+    """Hash del contenido extraído (no del .tar.gz, cuyas fechas cambian)."""
+    resumen = hashlib.sha256()
+    for nombre in sorted(archivos):
+        resumen.update(nombre.encode("utf-8"))
+        resumen.update(b"\0")
+        resumen.update(archivos[nombre].encode("utf-8"))
+        resumen.update(b"\0")
+    return resumen.hexdigest()
+
+
+def _leer_cap(contenido: str) -> dict | None:
+    """Extrae identificador, fecha de envío y tipo de un mensaje CAP."""
+    try:
+        raiz = ET.fromstring(contenido)
+    except ET.ParseError:
+        return None
+    identificador = raiz.findtext("{*}identifier")
+    if not identificador:
+        return None
+    return {
+        "identificador": identificador.strip(),
+        "enviado": (raiz.findtext("{*}sent") or "").strip(),
+        "tipo_mensaje": (raiz.findtext("{*}msgType") or "").strip(),
+    }
+
+
+def _cargar_estado(ruta_estado: str | None) -> dict:
+    if ruta_estado and os.path.exists(ruta_estado):
+        with open(ruta_estado, encoding="utf-8") as f:
+            return json.load(f)
+    return {"hashes": {}, "vistos": {}}
+
+
+def _guardar_estado(ruta_estado: str | None, estado: dict) -> None:
+    if not ruta_estado:
+        return
+    temporal = f"{ruta_estado}.tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(estado, f, ensure_ascii=False)
+    os.replace(temporal, ruta_estado)
+
+
+async def vigilar_avisos(
+    api_keys: Iterable[str],
+    areas: Iterable[str] | None = None,
+    intervalo: float = 300,
+    directorio: str | None = "avisos_cap",
+    ruta_estado: str | None = None,
+    ciclos: int | None = None,
+    retencion_dias: int = 7,
+    workers_metadatos: int = 2,
+    workers_descargas: int = 4,
+):
+    """Consulta periódicamente los últimos avisos y entrega solo los nuevos.
+
+    En cada consulta se piden todas las áreas en paralelo. Si el contenido
+    del archivo de un área no ha cambiado desde la consulta anterior, se
+    descarta sin procesarlo. Si ha cambiado, se extraen sus mensajes CAP y
+    se entregan los que tienen un identificador no visto antes (en ninguna
+    área). Los avisos de ámbito nacional ('esp') y autonómico se solapan,
+    así que esta deduplicación evita duplicados entre áreas.
+
+    Args:
+        api_keys: Iterable con las claves API de AEMET.
+        areas: Códigos de área a vigilar (por defecto, todos los de ``AREA_CODES``).
+        intervalo: Segundos entre consultas.
+        directorio: Carpeta donde guardar cada aviso nuevo como ``<identificador>.xml``.
+            Si es None, no se guarda nada en disco.
+        ruta_estado: Fichero JSON con los hashes e identificadores vistos,
+            para no repetir avisos entre ejecuciones. Si es None, el estado
+            solo vive en memoria.
+        ciclos: Número de consultas a realizar (por defecto, indefinidamente).
+        retencion_dias: Días que se recuerda un identificador ya visto.
+        workers_metadatos: Consultas de metadatos simultáneas.
+        workers_descargas: Descargas de archivos simultáneas.
+
+    Yields:
+        list: En cada consulta, los avisos nuevos como dicts con las claves
+              'identificador', 'area', 'enviado', 'tipo_mensaje', 'archivo',
+              'contenido' y 'ruta' (None si no se guarda en disco).
+
+    Example:
+        >>> async for nuevos in vigilar_avisos([API_KEY], intervalo=600):
+        ...     for aviso in nuevos:
+        ...         print(aviso["identificador"], aviso["area"])
+    """
+    api_keys_list = list(api_keys)
+    if not api_keys_list:
+        raise ValueError("Se requiere al menos una API key en 'api_keys'.")
+
+    areas_list = list(areas) if areas is not None else list(AREA_CODES)
+    for area in areas_list:
+        if area not in AREA_CODES:
+            valid_areas = ", ".join(AREA_CODES.keys())
+            raise ValueError(
+                f"Código de área '{area}' no válido. "
+                f"Códigos válidos: {valid_areas}"
+            )
+
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+    estado = _cargar_estado(ruta_estado)
+    unidades = [_unidad_avisos_area(area) for area in areas_list]
+
+    ciclo = 0
+    while ciclos is None or ciclo < ciclos:
+        ciclo += 1
+        ahora = datetime.now()
+        limite = (ahora - timedelta(days=retencion_dias)).isoformat(timespec="seconds")
+        estado["vistos"] = {
+            identificador: visto
+            for identificador, visto in estado["vistos"].items()
+            if visto >= limite
+        }
+
+        nuevos = []
+        sin_cambios = 0
+        async for indice, archivos in iterar_pipeline(
+            unidades,
+            api_keys_list,
+            descargar=descargar_archivo_tar_gz,
+            workers_metadatos=workers_metadatos,
+            workers_descargas=workers_descargas,
+            ordenado=True,
+            omitir_errores=True,
+        ):
+            area = areas_list[indice]
+            huella = _hash_contenido(archivos)
+            if estado["hashes"].get(area) == huella:
+                sin_cambios += 1
+                continue
+            estado["hashes"][area] = huella
+
+            for nombre, contenido in archivos.items():
+                cap = _leer_cap(contenido) if nombre.endswith(".xml") else None
+                if cap is None or cap["identificador"] in estado["vistos"]:
+                    continue
+                estado["vistos"][cap["identificador"]] = ahora.isoformat(timespec="seconds")
+                ruta = None
+                if directorio:
+                    nombre_seguro = re.sub(r"[^\w.-]", "_", cap["identificador"])
+                    ruta = os.path.join(directorio, f"{nombre_seguro}.xml")
+                    with open(ruta, "w", encoding="utf-8") as f:
+                        f.write(contenido)
+                nuevos.append({
+                    **cap,
+                    "area": area,
+                    "archivo": nombre,
+                    "contenido": contenido,
+                    "ruta": ruta,
+                })
+
+        _guardar_estado(ruta_estado, estado)
+        print(
+            f"🔔 Consulta {ciclo}: {len(nuevos)} avisos nuevos, "
+            f"{sin_cambios} áreas sin cambios"
+        )
+        yield nuevos
+
+        if ciclos is None or ciclo < ciclos:
+            await asyncio.sleep(intervalo)
@@ -5,7 +5,6 @@ import argparse
 import os
 
 import sys
-from aemetdata import AemetClient
 
 
 # Alias de endpoints comunes
@@ -16,18 +15,198 @@ ENDPOINT_ALIASES = {
     # Añade más alias según necesidades
 }
 
+# Alias que reparten la consulta en unidades, como las funciones de
+# aemetdata.climatologia y aemetdata.avisos. Valor: parámetros requeridos.
+FUNCION_ALIASES = {
+    "climatologia-diaria": "estaciones=3195,3427Y fechaini=AAAA-MM-DD fechafin=AAAA-MM-DD",
+    "climatologia-mensual": "estaciones=3195 anioini=AAAA aniofin=AAAA",
+    "normales": "estaciones=3195,3427Y",
+    "extremos": "estaciones=3195 [parametros=P,T,V]",
+    "avisos-area": "area=72",
+    "avisos-fechas": "fechaini=AAAA-MM-DD fechafin=AAAA-MM-DD",
+    "prediccion-diaria": "municipios=28079,08019",
+    "prediccion-horaria": "municipios=28079",
+}
+
+TAMANO_BLOQUE = 64 * 1024
+
 
 def print_aliases():
     msg = ["Alias de endpoints disponibles:"]
     for alias, endpoint in ENDPOINT_ALIASES.items():
         msg.append(f"  {alias}: {endpoint}")
+    msg.append("\nAlias de funciones (descarga por estación/intervalo):")
+    for alias, parametros in FUNCION_ALIASES.items():
+        msg.append(f"  {alias}: {parametros}")
     msg.append("\nPuedes usar --alias <nombre> y completar los parámetros requeridos con --param clave=valor")
     print("\n".join(msg))
 
 
+def parse_params(params):
+    """Convierte una lista 'clave=valor' en un dict."""
+    resultado = {}
+    for param in params:
+        if "=" not in param:
+            print(f"Parámetro mal formado (se espera clave=valor): {param}")
+            sys.exit(1)
+        clave, valor = param.split("=", 1)
+        resultado[clave] = valor
+    return resultado
+
+
+def leer_claves(args):
+    """Reúne las claves de --keys-file, --api-key y AEMET_API_KEY."""
+    claves = []
+    if args.keys_file:
+        with open(args.keys_file, encoding="utf-8") as f:
+            for linea in f:
+                linea = linea.strip()
+                if linea and not linea.startswith("#"):
+                    claves.append(linea)
+    if args.api_key:
+        claves.append(args.api_key)
+    if not claves and os.environ.get("AEMET_API_KEY"):
+        claves.append(os.environ["AEMET_API_KEY"])
+    return claves
+
+
+def construir_unidades(alias, params):
+    """Unidades de trabajo de un alias de función.
+
+    Returns:
+        tuple: ``(unidades, es_archivo)``; ``es_archivo`` indica que los
+               datos son archivos comprimidos (avisos CAP) y no JSON.
+    """
+    from aemetdata import avisos, climatologia, predicciones
+
+    def estaciones():
+        return [e for e in params["estaciones"].split(",") if e]
+
+    if alias == "climatologia-diaria":
+        intervalos = climatologia._generar_intervalos_diarios(
+            climatologia._parse_fecha(climatologia._completar_fecha(params["fechaini"], True)),
+            climatologia._parse_fecha(climatologia._completar_fecha(params["fechafin"], False)),
+        )
+        return climatologia._unidades_diarias(estaciones(), intervalos), False
+    if alias == "climatologia-mensual":
+        return climatologia._unidades_mensuales(
+            estaciones(), int(params["anioini"]), int(params["aniofin"])
+        ), False
+    if alias == "normales":
+        return climatologia._unidades_normales(estaciones()), False
+    if alias == "extremos":
+        parametros = params.get("parametros", "P,T,V").split(",")
+        return climatologia._unidades_extremos(estaciones(), parametros), False
+    if alias == "avisos-area":
+        if params["area"] not in avisos.AREA_CODES:
+            raise ValueError(f"Código de área '{params['area']}' no válido.")
+        return [avisos._unidad_avisos_area(params["area"])], True
+    if alias == "avisos-fechas":
+        unidades, _ = avisos._unidades_avisos_fechas(params["fechaini"], params["fechafin"])
+        return unidades, True
+    if alias in ("prediccion-diaria", "prediccion-horaria"):
+        tipo = alias.split("-", 1)[1]
+        codigos = [
+            predicciones._codigo_municipio(municipio)
+            for municipio in params["municipios"].split(",") if municipio
+        ]
+        return predicciones._unidades_predicciones(codigos, tipo), False
+    raise ValueError(f"Alias desconocido: {alias}")
+
+
+def abrir_salida(ruta):
+    """Abre el destino binario: stdout, fichero, .gz o .zst según la ruta."""
+    if ruta in (None, "-"):
+        return sys.stdout.buffer
+    if ruta.endswith(".gz"):
+        import gzip
+
+        return gzip.open(ruta, "wb")
+    if ruta.endswith(".zst"):
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("Falta el paquete 'zstandard'. Instálalo con 'pip install zstandard'.")
+        return zstandard.ZstdCompressor().stream_writer(open(ruta, "wb"))
+    return open(ruta, "wb")
+
 
+def _escribir_ndjson(destino, datos, es_archivo):
+    import json
 
-    import sys
+    if es_archivo:
+        registros = [
+            {"archivo": nombre, "contenido": contenido} for nombre, contenido in datos.items()
+        ]
+    elif isinstance(datos, list):
+        registros = datos
+    elif isinstance(datos, dict):
+        registros = [datos]
+    else:
+        registros = [{"contenido": str(datos)}]
+    for registro in registros:
+        destino.write(json.dumps(registro, ensure_ascii=False).encode("utf-8"))
+        destino.write(b"\n")
+    return len(registros)
+
+
+async def exportar(unidades, api_keys, destino, formato="ndjson", concurrencia=4, es_archivo=False):
+    """Descarga las unidades y las escribe en ``destino`` según van llegando.
+
+    En formato ``ndjson`` cada registro se escribe como una línea JSON en
+    cuanto llega su unidad. En formato ``raw`` el contenido de ``datos`` se
+    copia tal cual, bloque a bloque y en el orden de las unidades; cada
+    descarga pasa por un fichero temporal que solo se queda en memoria si es
+    pequeño.
+
+    Las peticiones de metadatos se reparten entre las claves respetando la
+    cuota de cada una (ver :class:`aemetdata.utils.multiproceso.CuotaCompartida`).
+
+    Returns:
+        int: Registros (ndjson) o bytes (raw) escritos.
+    """
+    import tempfile
+
+    from aemetdata.utils.multiproceso import CuotaCompartida
+    from aemetdata.utils.pipeline import iterar_pipeline
+    from aemetdata.utils.suport_functions import (
+        descargar_archivo_tar_gz,
+        descargar_en_streaming,
+        fetch_json_url,
+    )
+
+    opciones = {
+        "workers_metadatos": max(1, min(concurrencia, len(api_keys))),
+        "workers_descargas": concurrencia,
+        "limitador": CuotaCompartida(len(api_keys)),
+    }
+    escritos = 0
+    if formato == "ndjson":
+        descargar = descargar_archivo_tar_gz if es_archivo else fetch_json_url
+        async for _, datos in iterar_pipeline(unidades, api_keys, descargar=descargar, **opciones):
+            escritos += _escribir_ndjson(destino, datos, es_archivo)
+        return escritos
+
+    async def descargar_a_temporal(url):
+        temporal = tempfile.SpooledTemporaryFile(max_size=16 * TAMANO_BLOQUE)
+        await descargar_en_streaming(url, temporal)
+        temporal.seek(0)
+        return temporal
+
+    async for _, temporal in iterar_pipeline(
+        unidades, api_keys, descargar=descargar_a_temporal, ordenado=True, **opciones
+    ):
+        with temporal:
+            while True:
+                bloque = temporal.read(TAMANO_BLOQUE)
+                if not bloque:
+                    break
+                destino.write(bloque)
+                escritos += len(bloque)
+    return escritos
+
+
+def main():
     if "--list" in sys.argv:
         print_aliases()
         sys.exit(0)
@@ -43,7 +222,7 @@ def print_aliases():
     parser.add_argument(
         "--alias",
         type=str,
-        help="Alias de endpoint predefinido (ej: diarios, mensuales, avisos)"
+        help="Alias de endpoint o de función (ej: diarios, climatologia-diaria, avisos-area). Ver --list"
     )
     parser.add_argument(
         "--param",
@@ -55,7 +234,21 @@ def print_aliases():
         "--output",
         type=str,
         required=False,
-        help="Archivo de salida (si no se indica, muestra los primeros 500 caracteres en pantalla)"
+        help="Archivo de salida; '.gz' o '.zst' para comprimir. Si no se indica (o es '-'), se escribe en stdout"
+    )
+    parser.add_argument(
+        "--formato",
+        choices=["ndjson", "raw"],
+        default=None,
+        help="ndjson: un registro JSON por línea; raw: contenido de 'datos' sin transformar "
+             "(por defecto ndjson, o raw para avisos)"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="Descargas simultáneas (por defecto 4). Los metadatos se reparten entre las claves, "
+             "como máximo una petición simultánea por clave y respetando su cuota"
     )
     parser.add_argument(
         "--api-key",
@@ -63,39 +256,125 @@ def print_aliases():
         required=False,
         help="API Key de AEMET OpenData (opcional, si no se indica se usa la variable de entorno AEMET_API_KEY)"
     )
+    parser.add_argument(
+        "--keys-file",
+        type=str,
+        required=False,
+        help="Fichero con una API Key por línea (se combinan con --api-key)"
+    )
+    parser.add_argument(
+        "--refrescar-referencia",
+        action="store_true",
+        help="Descarga normales y extremos de todas las estaciones a la referencia local"
+    )
+    parser.add_argument(
+        "--referencia",
+        type=str,
+        required=False,
+        help="Fichero de la referencia local (por defecto ~/.aemetdata/referencia_climatologica.json.gz)"
+    )
+    parser.add_argument(
+        "--perfil",
+        action="store_true",
+        help="Muestra al final el tiempo por etapa, las unidades más lentas y las peticiones por segundo"
+    )
 
 
     args = parser.parse_args()
 
-    # --- Corregir indentación del manejo de error de parámetros ---
-    if args.alias:
-        if args.alias not in ENDPOINT_ALIASES:
-            print(f"Alias desconocido: {args.alias}")
-            print_aliases()
-            sys.exit(1)
-        endpoint_template = ENDPOINT_ALIASES[args.alias]
-        params = parse_params(args.param or [])
+    api_keys = leer_claves(args)
+    if not api_keys:
+        print("ERROR: Debes proporcionar una API Key con --api-key, --keys-file o la variable de entorno AEMET_API_KEY.")
+        sys.exit(1)
+    if args.concurrency < 1:
+        print("ERROR: --concurrency debe ser al menos 1.")
+        sys.exit(1)
+
+    import asyncio
+
+    if args.refrescar_referencia:
+        from aemetdata.climatologia.referencia import precargar_referencia
+        from aemetdata.utils.multiproceso import CuotaCompartida
+
+        asyncio.run(precargar_referencia(
+            api_keys,
+            ruta=args.referencia,
+            workers_metadatos=min(args.concurrency, len(api_keys)),
+            workers_descargas=args.concurrency,
+            limitador=CuotaCompartida(len(api_keys)),
+        ))
+        sys.exit(0)
+
+    params = parse_params(args.param or [])
+    es_archivo = False
+    if args.alias in FUNCION_ALIASES:
         try:
-            endpoint = endpoint_template.format(**params)
+            unidades, es_archivo = construir_unidades(args.alias, params)
         except KeyError as e:
             print(f"Falta el parámetro requerido: {e.args[0]}")
-            print(f"Ejemplo: --param fechaini=2024-01-01 fechafin=2024-01-02")
+            print(f"Ejemplo: --alias {args.alias} --param {FUNCION_ALIASES[args.alias]}")
+            sys.exit(1)
+        except ValueError as e:
+            print(f"ERROR: {e}")
             sys.exit(1)
     else:
-        endpoint = args.endpoint
+        if args.alias:
+            if args.alias not in ENDPOINT_ALIASES:
+                print(f"Alias desconocido: {args.alias}")
+                print_aliases()
+                sys.exit(1)
+            endpoint_template = ENDPOINT_ALIASES[args.alias]
+            try:
+                endpoint = endpoint_template.format(**params)
+            except KeyError as e:
+                print(f"Falta el parámetro requerido: {e.args[0]}")
+                print(f"Ejemplo: --param fechaini=2024-01-01 fechafin=2024-01-02")
+                sys.exit(1)
+        elif args.endpoint:
+            endpoint = args.endpoint
+        else:
+            print("ERROR: Indica --endpoint o --alias (ver --list).")
+            sys.exit(1)
+        separador = "&" if "?" in endpoint else "?"
+        unidades = [(
+            f"https://opendata.aemet.es/opendata/api/{endpoint}{separador}api_key={{apiKey}}",
+            endpoint,
+            endpoint,
+        )]
+
+    formato = args.formato or ("raw" if es_archivo else "ndjson")
+    from contextlib import nullcontext, redirect_stdout
 
-    api_key = args.api_key or os.environ.get("AEMET_API_KEY")
-    if not api_key:
-        print("ERROR: Debes proporcionar una API Key con --api-key o la variable de entorno AEMET_API_KEY.")
+    from aemetdata.utils.suport_functions import AemetError
+
+    try:
+        destino = abrir_salida(args.output)
+    except ImportError as e:
+        print(f"ERROR: {e}")
         sys.exit(1)
+    a_stdout = destino is sys.stdout.buffer
+    perfilado = nullcontext()
+    if args.perfil:
+        from aemetdata.utils.perfilado import perfilar
 
-    client = AemetClient(api_key=api_key)
-    data = client.download_data(endpoint)
+        perfilado = perfilar()
+    # Con la salida en stdout, los mensajes de progreso van a stderr.
+    with (redirect_stdout(sys.stderr) if a_stdout else nullcontext()), perfilado:
+        try:
+            escritos = asyncio.run(exportar(
+                unidades, api_keys, destino, formato, args.concurrency, es_archivo
+            ))
+        except AemetError as e:
+            print(f"ERROR: {e}")
+            sys.exit(1)
+        finally:
+            if a_stdout:
+                destino.flush()
+            else:
+                destino.close()
+        unidad = "registros" if formato == "ndjson" else "bytes"
+        print(f"Datos guardados en {args.output or 'stdout'} ({escritos} {unidad})")
 
-    if args.output:
-        with open(args.output, "w", encoding="utf-8") as f:
-            f.write(data)
-        print(f"Datos guardados en {args.output}")
-    else:
-        print(data[:500])
-        print(f"Datos guardados en {args.output}")
+
+if __name__ == "__main__":
+    main()
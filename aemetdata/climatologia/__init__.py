@@ -10,21 +10,216 @@ from __future__ import annotations
 from typing import Iterable
 import re
 import json
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from ..utils.suport_functions import (
-    fetch_con_reintentos_endpoint_aemet,
-    fetch_json_url,
-    AemetError,
+    AemetSinDatos,
     get_relativedelta,
 )
+from ..utils.almacen import AlmacenSQLite
+from ..utils.cache import CacheMemoria
+from ..utils.cobertura import Cobertura
+from ..utils.perfilado import medir
+from ..utils.pipeline import iterar_pipeline
+from ..utils.resultados import ResultadosCompactos
 
 
+_FORMATO_FECHA_COMPLETA = r"^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}UTC$"
+_FORMATO_FECHA_SIMPLE = r"^\d{4}-\d{2}-\d{2}$"
+
+
+def _completar_fecha(fecha: str, inicio: bool) -> str:
+    if re.match(_FORMATO_FECHA_COMPLETA, fecha):
+        return fecha
+    elif re.match(_FORMATO_FECHA_SIMPLE, fecha):
+        return f"{fecha}T00:00:00UTC" if inicio else f"{fecha}T23:59:59UTC"
+    else:
+        raise ValueError(
+            f"La fecha '{fecha}' debe estar en formato 'AAAA-MM-DD' o 'AAAA-MM-DDTHH:MM:SSUTC'."
+        )
+
+
+def _parse_fecha(fecha):
+    if 'T' in fecha:
+        return datetime.strptime(fecha, '%Y-%m-%dT%H:%M:%SUTC')
+    return datetime.strptime(fecha, '%Y-%m-%d')
+
+
+def _fin_maximo_intervalo(inicio):
+    """Último día que cabe en una ventana de datos diarios que empieza en ``inicio``."""
+    relativedelta = get_relativedelta()
+    return inicio + relativedelta(months=+5, days=+29)
+
+
+def _generar_intervalos_diarios(dt_inicio, dt_fin):
+    intervalos = []
+    actual = dt_inicio
+    while actual <= dt_fin:
+        siguiente = _fin_maximo_intervalo(actual)
+        if siguiente > dt_fin:
+            siguiente = dt_fin
+        intervalos.append((actual, siguiente))
+        actual = siguiente + timedelta(days=1)
+    return intervalos
+
+
+def _unidad_diaria(idema_item, intervalo_inicio, intervalo_fin):
+    fecha_ini_str = intervalo_inicio.strftime('%Y-%m-%dT00:00:00UTC')
+    fecha_fin_str = intervalo_fin.strftime('%Y-%m-%dT23:59:59UTC')
+    endpoint_template = (
+        "https://opendata.aemet.es/opendata/api/valores/climatologicos/diarios/datos/"
+        f"fechaini/{fecha_ini_str}/fechafin/{fecha_fin_str}/estacion/{idema_item}?api_key={{apiKey}}"
+    )
+    return (
+        endpoint_template,
+        f"climatologia_diaria_{idema_item}_{fecha_ini_str}_{fecha_fin_str}",
+        f"climatología diaria para estación {idema_item} entre {fecha_ini_str} y {fecha_fin_str}",
+    )
+
+
+def _unidades_diarias(idemas, intervalos):
+    return [
+        _unidad_diaria(idema_item, intervalo_inicio, intervalo_fin)
+        for idema_item in idemas
+        for intervalo_inicio, intervalo_fin in intervalos
+    ]
+
+
+def _unidades_mensuales(idemas, anio_inicio, anio_fin):
+    unidades = []
+    for idema_item in idemas:
+        anio_ini = anio_inicio
+        while anio_ini <= anio_fin:
+            anio_fin_intervalo = min(anio_ini + 2, anio_fin)
+            endpoint_template = (
+                "https://opendata.aemet.es/opendata/api/valores/climatologicos/"
+                f"mensualesanuales/datos/anioini/{anio_ini}/aniofin/{anio_fin_intervalo}/"
+                f"estacion/{idema_item}?api_key={{apiKey}}"
+            )
+            unidades.append((
+                endpoint_template,
+                f"climatologia_mensual_{idema_item}_{anio_ini}_{anio_fin_intervalo}",
+                f"climatología mensual para estación {idema_item} entre {anio_ini} y {anio_fin_intervalo}",
+            ))
+            anio_ini = anio_fin_intervalo + 1
+    return unidades
+
+
+def _unidades_extremos(idemas, parametros):
+    unidades = []
+    for idema_item in idemas:
+        for parametro in parametros:
+            endpoint_template = (
+                "https://opendata.aemet.es/opendata/api/valores/climatologicos/valoresextremos/"
+                f"parametro/{parametro}/estacion/{idema_item}?api_key={{apiKey}}"
+            )
+            unidades.append((
+                endpoint_template,
+                f"climatologia_extremos_{idema_item}_{parametro}",
+                f"valores extremos para estación {idema_item}, parámetro {parametro}",
+            ))
+    return unidades
+
+
+def _unidades_normales(idemas):
+    unidades = []
+    for idema_item in idemas:
+        endpoint_template = (
+            "https://opendata.aemet.es/opendata/api/valores/climatologicos/normales/"
+            f"estacion/{idema_item}?api_key={{apiKey}}"
+        )
+        unidades.append((
+            endpoint_template,
+            f"climatologia_normales_{idema_item}",
+            f"valores normales para estación {idema_item}",
+        ))
+    return unidades
+
+
+async def _descargar_unidades(
+    unidades,
+    api_keys_list,
+    all_results,
+    workers_metadatos,
+    workers_descargas,
+    almacen=None,
+    tabla=None,
+    periodos=None,
+    cobertura=None,
+    plazo=None,
+    cache=None,
+    clave_cache=None,
+):
+    """Descarga las unidades en pipeline y acumula sus registros en orden.
+
+    Si se indica ``almacen``, cada respuesta se guarda además en ``tabla``
+    (``periodos`` da el periodo de cada unidad cuando el registro no lo trae).
+    Con ``cache``, el resultado se guarda en ella bajo ``clave_cache``.
+    """
+    async for indice, datos in iterar_pipeline(
+        unidades,
+        api_keys_list,
+        workers_metadatos=workers_metadatos,
+        workers_descargas=workers_descargas,
+        ordenado=True,
+        cobertura=cobertura,
+        plazo=plazo,
+    ):
+        with medir("fusion", unidad=unidades[indice][1]):
+            if almacen is not None:
+                registros = []
+                _anadir_resultados(registros, datos)
+                almacen.guardar(tabla, registros, periodo=periodos[indice] if periodos else None)
+            _anadir_resultados(all_results, datos)
+    if almacen is not None:
+        almacen.confirmar()
+    print(f"✅ Descargadas {len(unidades)} consulta(s) a AEMET")
+    if cache is not None:
+        guardado = cache.guardar(clave_cache, all_results)
+        if isinstance(all_results, ResultadosCompactos):
+            return guardado
+    return all_results
+
+
+def _consultar_cache(cache, clave_cache, compacto):
+    """Resultado en caché o None. Fuera del modo compacto, una lista nueva."""
+    en_cache = cache.obtener(clave_cache)
+    if en_cache is None or compacto:
+        return en_cache
+    return list(en_cache)
+
+
+def _anadir_resultados(all_results, datos):
+    """Añade a ``all_results`` los registros de una respuesta de AEMET."""
+    # Si es lista, concatenar
+    if isinstance(datos, list):
+        all_results.extend(datos)
+    elif isinstance(datos, dict):
+        all_results.append(datos)
+    else:
+        try:
+            data = json.loads(datos)
+            if isinstance(data, list):
+                all_results.extend(data)
+            elif isinstance(data, dict):
+                all_results.append(data)
+            else:
+                all_results.append({'contenido': str(datos)})
+        except Exception:
+            all_results.append({'contenido': str(datos)})
+
 
 async def datos_mensuales(
     idema: str,
     anio_inicio: int,
     anio_fin: int,
     api_keys: Iterable[str],
+    compacto: bool = False,
+    workers_metadatos: int = 1,
+    workers_descargas: int = 1,
+    almacen: AlmacenSQLite | None = None,
+    cobertura: Cobertura | None = None,
+    plazo: float | None = None,
+    cache: CacheMemoria | None = None,
 ) -> dict:
     """Descarga los datos climatológicos mensuales por estación y rango de años.
 
@@ -33,6 +228,19 @@ async def datos_mensuales(
         anio_inicio: Año inicial (incluido).
         anio_fin: Año final (incluido).
         api_keys: Iterable con las claves API de AEMET.
+        compacto: Si es True, devuelve un ``ResultadosCompactos`` en lugar de
+            una lista de dicts (mucha menos memoria en descargas grandes).
+        workers_metadatos: Consultas de metadatos simultáneas (consumen cuota
+            de las claves).
+        workers_descargas: Descargas de ``datos`` simultáneas. Las dos etapas
+            se solapan: se resuelven metadatos mientras se descargan datos.
+        almacen: ``AlmacenSQLite`` opcional donde guardar (upsert) los registros
+            según se descargan.
+        cobertura: ``Cobertura`` opcional: si una llamada de metadatos tarda más
+            que el percentil configurado, se duplica con otra clave.
+        plazo: Segundos máximos por consulta (metadatos más descarga).
+        cache: ``CacheMemoria`` opcional: las consultas repetidas se sirven
+            desde memoria. Con ``compacto=True`` el resultado es de solo lectura.
     """
 
 
@@ -57,54 +265,19 @@ async def datos_mensuales(
     if not api_keys_list:
         raise ValueError("Se requiere al menos una API key en 'api_keys'.")
 
-    all_results = []
-    for idema_item in idemas:
-        anio_ini = anio_inicio
-        while anio_ini <= anio_fin:
-            anio_fin_intervalo = min(anio_ini + 2, anio_fin)
-            endpoint_template = (
-                "https://opendata.aemet.es/opendata/api/valores/climatologicos/"
-                f"mensualesanuales/datos/anioini/{anio_ini}/aniofin/{anio_fin_intervalo}/"
-                f"estacion/{idema_item}?api_key={{apiKey}}"
-            )
-            print(
-                f"🔍 Solicitando climatología mensual para estación {idema_item} "
-                f"entre {anio_ini} y {anio_fin_intervalo}"
-            )
-            response = await fetch_con_reintentos_endpoint_aemet(
-                endpoint_template,
-                tipo=f"climatologia_mensual_{idema_item}_{anio_ini}_{anio_fin_intervalo}",
-                api_keys=api_keys_list,
-            )
-            if response.get("estado") != 200:
-                raise AemetError(
-                    f"Error en AEMET: {response.get('descripcion', 'Error desconocido')} "
-                    f"(estado: {response.get('estado')})"
-                )
-            datos_url = response.get("datos")
-            if not datos_url:
-                raise AemetError("No se encontró URL de descarga en la respuesta de AEMET")
-            print(f"✨ Descargando datos de climatología mensual desde URL de AEMET: {datos_url}")
-            datos = await fetch_json_url(datos_url)
-            print(f"✅ Datos de climatología mensual descargados exitosamente para estación {idema_item}")
-            # Si es lista, concatenar
-            if isinstance(datos, list):
-                all_results.extend(datos)
-            elif isinstance(datos, dict):
-                all_results.append(datos)
-            else:
-                try:
-                    data = json.loads(datos)
-                    if isinstance(data, list):
-                        all_results.extend(data)
-                    elif isinstance(data, dict):
-                        all_results.append(data)
-                    else:
-                        all_results.append({'contenido': str(datos)})
-                except Exception:
-                    all_results.append({'contenido': str(datos)})
-            anio_ini = anio_fin_intervalo + 1
-    return all_results
+    clave_cache = ("mensuales", tuple(idemas), anio_inicio, anio_fin)
+    if cache is not None:
+        en_cache = _consultar_cache(cache, clave_cache, compacto)
+        if en_cache is not None:
+            return en_cache
+
+    all_results = ResultadosCompactos() if compacto else []
+    unidades = _unidades_mensuales(idemas, anio_inicio, anio_fin)
+    return await _descargar_unidades(
+        unidades, api_keys_list, all_results, workers_metadatos, workers_descargas,
+        almacen=almacen, tabla="mensuales",
+        cobertura=cobertura, plazo=plazo, cache=cache, clave_cache=clave_cache,
+    )
 
 
 async def datos_diarios(
@@ -112,6 +285,13 @@ async def datos_diarios(
     fecha_inicio: str,
     fecha_fin: str,
     api_keys: Iterable[str],
+    compacto: bool = False,
+    workers_metadatos: int = 1,
+    workers_descargas: int = 1,
+    almacen: AlmacenSQLite | None = None,
+    cobertura: Cobertura | None = None,
+    plazo: float | None = None,
+    cache: CacheMemoria | None = None,
 ) -> dict:
     """Descarga los datos climatológicos diarios por estación y rango de fechas.
 
@@ -119,7 +299,21 @@ async def datos_diarios(
         idema: Identificador de estación (IDEMA).
         fecha_inicio: Fecha inicial en formato 'AAAA-MM-DDTHH:MM:SSUTC' (ejemplo: '2022-01-01T00:00:00UTC').
         fecha_fin: Fecha final en formato 'AAAA-MM-DDTHH:MM:SSUTC' (ejemplo: '2022-01-31T23:59:59UTC').
-        api_keys: Iterable con las claves API de AEMET."""
+        api_keys: Iterable con las claves API de AEMET.
+        compacto: Si es True, devuelve un ``ResultadosCompactos`` en lugar de
+            una lista de dicts (mucha menos memoria en descargas grandes).
+        workers_metadatos: Consultas de metadatos simultáneas (consumen cuota
+            de las claves).
+        workers_descargas: Descargas de ``datos`` simultáneas. Las dos etapas
+            se solapan: se resuelven metadatos mientras se descargan datos.
+        almacen: ``AlmacenSQLite`` opcional donde guardar (upsert) los registros
+            según se descargan.
+        cobertura: ``Cobertura`` opcional: si una llamada de metadatos tarda más
+            que el percentil configurado, se duplica con otra clave.
+        plazo: Segundos máximos por consulta (metadatos más descarga).
+        cache: ``CacheMemoria`` opcional: las consultas repetidas se sirven
+            desde memoria. Con ``compacto=True`` el resultado es de solo lectura.
+    """
     
     if isinstance(idema, str):
         idemas = [idema]
@@ -132,94 +326,27 @@ async def datos_diarios(
         raise ValueError("El parámetro 'idema' es obligatorio.")
 
 
-    relativedelta = get_relativedelta()
-    formato_fecha_completa = r"^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}UTC$"
-    formato_fecha_simple = r"^\d{4}-\d{2}-\d{2}$"
-
-    def completar_fecha(fecha: str, inicio: bool) -> str:
-        if re.match(formato_fecha_completa, fecha):
-            return fecha
-        elif re.match(formato_fecha_simple, fecha):
-            return f"{fecha}T00:00:00UTC" if inicio else f"{fecha}T23:59:59UTC"
-        else:
-            raise ValueError(
-                f"La fecha '{fecha}' debe estar en formato 'AAAA-MM-DD' o 'AAAA-MM-DDTHH:MM:SSUTC'."
-            )
-
-    fecha_inicio = completar_fecha(fecha_inicio, True)
-    fecha_fin = completar_fecha(fecha_fin, False)
-
-    def parse_fecha(fecha):
-        if 'T' in fecha:
-            return datetime.strptime(fecha, '%Y-%m-%dT%H:%M:%SUTC')
-        return datetime.strptime(fecha, '%Y-%m-%d')
-
-    dt_inicio = parse_fecha(fecha_inicio)
-    dt_fin = parse_fecha(fecha_fin)
-
-    def generar_intervalos(dt_inicio, dt_fin):
-        intervalos = []
-        actual = dt_inicio
-        while actual <= dt_fin:
-            siguiente = actual + relativedelta(months=+5, days=+29)
-            if siguiente > dt_fin:
-                siguiente = dt_fin
-            intervalos.append((actual, siguiente))
-            actual = siguiente + timedelta(days=1)
-        return intervalos
-
-    intervalos = generar_intervalos(dt_inicio, dt_fin)
+    fecha_inicio = _completar_fecha(fecha_inicio, True)
+    fecha_fin = _completar_fecha(fecha_fin, False)
 
     api_keys_list = list(api_keys)
     if not api_keys_list:
         raise ValueError("Se requiere al menos una API key en 'api_keys'.")
 
-    all_results = []
-    for idema_item in idemas:
-        for intervalo_inicio, intervalo_fin in intervalos:
-            fecha_ini_str = intervalo_inicio.strftime('%Y-%m-%dT00:00:00UTC')
-            fecha_fin_str = intervalo_fin.strftime('%Y-%m-%dT23:59:59UTC')
-            endpoint_template = (
-                "https://opendata.aemet.es/opendata/api/valores/climatologicos/diarios/datos/"
-                f"fechaini/{fecha_ini_str}/fechafin/{fecha_fin_str}/estacion/{idema_item}?api_key={{apiKey}}"
-            )
-            print(
-                f"🔍 Solicitando climatología diaria para estación {idema_item} "
-                f"entre {fecha_ini_str} y {fecha_fin_str}"
-            )
-            response = await fetch_con_reintentos_endpoint_aemet(
-                endpoint_template,
-                tipo=f"climatologia_diaria_{idema_item}_{fecha_ini_str}_{fecha_fin_str}",
-                api_keys=api_keys_list,
-            )
-            if response.get("estado") != 200:
-                raise AemetError(
-                    f"Error en AEMET: {response.get('descripcion', 'Error desconocido')} "
-                    f"(estado: {response.get('estado')})"
-                )
-            datos_url = response.get("datos")
-            if not datos_url:
-                raise AemetError("No se encontró URL de descarga en la respuesta de AEMET")
-            print(f"✨ Descargando datos de climatología diaria desde URL de AEMET: {datos_url}")
-            datos = await fetch_json_url(datos_url)
-            print(f"✅ Datos de climatología diaria descargados exitosamente para estación {idema_item}")
-            # Si es lista, concatenar
-            if isinstance(datos, list):
-                all_results.extend(datos)
-            elif isinstance(datos, dict):
-                all_results.append(datos)
-            else:
-                try:
-                    data = json.loads(datos)
-                    if isinstance(data, list):
-                        all_results.extend(data)
-                    elif isinstance(data, dict):
-                        all_results.append(data)
-                    else:
-                        all_results.append({'contenido': str(datos)})
-                except Exception:
-                    all_results.append({'contenido': str(datos)})
-    return all_results
+    clave_cache = ("diarios", tuple(idemas), fecha_inicio, fecha_fin)
+    if cache is not None:
+        en_cache = _consultar_cache(cache, clave_cache, compacto)
+        if en_cache is not None:
+            return en_cache
+
+    intervalos = _generar_intervalos_diarios(_parse_fecha(fecha_inicio), _parse_fecha(fecha_fin))
+    all_results = ResultadosCompactos() if compacto else []
+    unidades = _unidades_diarias(idemas, intervalos)
+    return await _descargar_unidades(
+        unidades, api_keys_list, all_results, workers_metadatos, workers_descargas,
+        almacen=almacen, tabla="diarios",
+        cobertura=cobertura, plazo=plazo, cache=cache, clave_cache=clave_cache,
+    )
 
 
 
@@ -227,6 +354,13 @@ async def datos_extremos(
     idema: str,
     api_keys: Iterable[str],
     parametro: str | Iterable[str] = None,
+    compacto: bool = False,
+    workers_metadatos: int = 1,
+    workers_descargas: int = 1,
+    almacen: AlmacenSQLite | None = None,
+    cobertura: Cobertura | None = None,
+    plazo: float | None = None,
+    cache: CacheMemoria | None = None,
 ) -> dict:
     """Descarga los valores extremos climatológicos por estación y parámetros.
 
@@ -234,6 +368,19 @@ async def datos_extremos(
         idema: Identificador de estación (IDEMA).
         api_keys: Iterable con las claves API de AEMET.
         parametro: Parámetro o lista de parámetros (por defecto ["P", "T", "V"]).
+        compacto: Si es True, devuelve un ``ResultadosCompactos`` en lugar de
+            una lista de dicts (mucha menos memoria en descargas grandes).
+        workers_metadatos: Consultas de metadatos simultáneas (consumen cuota
+            de las claves).
+        workers_descargas: Descargas de ``datos`` simultáneas. Las dos etapas
+            se solapan: se resuelven metadatos mientras se descargan datos.
+        almacen: ``AlmacenSQLite`` opcional donde guardar (upsert) los registros
+            según se descargan.
+        cobertura: ``Cobertura`` opcional: si una llamada de metadatos tarda más
+            que el percentil configurado, se duplica con otra clave.
+        plazo: Segundos máximos por consulta (metadatos más descarga).
+        cache: ``CacheMemoria`` opcional: las consultas repetidas se sirven
+            desde memoria. Con ``compacto=True`` el resultado es de solo lectura.
     """
     if parametro is None:
         parametros = ["P", "T", "V"]
@@ -257,57 +404,51 @@ async def datos_extremos(
     if not api_keys_list:
         raise ValueError("Se requiere al menos una API key en 'api_keys'.")
 
-    all_results = []
-    for idema_item in idemas:
-        for parametro in parametros:
-            endpoint_template = (
-                "https://opendata.aemet.es/opendata/api/valores/climatologicos/valoresextremos/"
-                f"parametro/{parametro}/estacion/{idema_item}?api_key={{apiKey}}"
-            )
-            print(f"🔍 Solicitando valores extremos para estación {idema_item}, parámetro {parametro}")
-            response = await fetch_con_reintentos_endpoint_aemet(
-                endpoint_template,
-                tipo=f"climatologia_extremos_{idema_item}_{parametro}",
-                api_keys=api_keys_list,
-            )
-            if response.get("estado") != 200:
-                raise AemetError(
-                    f"Error en AEMET: {response.get('descripcion', 'Error desconocido')} "
-                    f"(estado: {response.get('estado')})"
-                )
-            datos_url = response.get("datos")
-            if not datos_url:
-                raise AemetError("No se encontró URL de descarga en la respuesta de AEMET")
-            print(f"✨ Descargando valores extremos desde URL de AEMET: {datos_url}")
-            datos = await fetch_json_url(datos_url)
-            print(f"✅ Valores extremos descargados exitosamente para estación {idema_item}, parámetro {parametro}")
-            if isinstance(datos, list):
-                all_results.extend(datos)
-            elif isinstance(datos, dict):
-                all_results.append(datos)
-            else:
-                try:
-                    data = json.loads(datos)
-                    if isinstance(data, list):
-                        all_results.extend(data)
-                    elif isinstance(data, dict):
-                        all_results.append(data)
-                    else:
-                        all_results.append({'contenido': str(datos)})
-                except Exception:
-                    all_results.append({'contenido': str(datos)})
-    return all_results
+    clave_cache = ("extremos", tuple(idemas), tuple(parametros))
+    if cache is not None:
+        en_cache = _consultar_cache(cache, clave_cache, compacto)
+        if en_cache is not None:
+            return en_cache
+
+    all_results = ResultadosCompactos() if compacto else []
+    unidades = _unidades_extremos(idemas, parametros)
+    periodos = [parametro for _ in idemas for parametro in parametros]
+    return await _descargar_unidades(
+        unidades, api_keys_list, all_results, workers_metadatos, workers_descargas,
+        almacen=almacen, tabla="extremos", periodos=periodos,
+        cobertura=cobertura, plazo=plazo, cache=cache, clave_cache=clave_cache,
+    )
 
 
 async def datos_normales(
     idema: str,
     api_keys: Iterable[str],
+    compacto: bool = False,
+    workers_metadatos: int = 1,
+    workers_descargas: int = 1,
+    almacen: AlmacenSQLite | None = None,
+    cobertura: Cobertura | None = None,
+    plazo: float | None = None,
+    cache: CacheMemoria | None = None,
 ) -> dict:
     """Descarga los valores normales climatológicos por estación.
 
     Args:
         idema: Identificador de estación (IDEMA).
         api_keys: Iterable con las claves API de AEMET.
+        compacto: Si es True, devuelve un ``ResultadosCompactos`` en lugar de
+            una lista de dicts (mucha menos memoria en descargas grandes).
+        workers_metadatos: Consultas de metadatos simultáneas (consumen cuota
+            de las claves).
+        workers_descargas: Descargas de ``datos`` simultáneas. Las dos etapas
+            se solapan: se resuelven metadatos mientras se descargan datos.
+        almacen: ``AlmacenSQLite`` opcional donde guardar (upsert) los registros
+            según se descargan.
+        cobertura: ``Cobertura`` opcional: si una llamada de metadatos tarda más
+            que el percentil configurado, se duplica con otra clave.
+        plazo: Segundos máximos por consulta (metadatos más descarga).
+        cache: ``CacheMemoria`` opcional: las consultas repetidas se sirven
+            desde memoria. Con ``compacto=True`` el resultado es de solo lectura.
     """
     if isinstance(idema, str):
         idemas = [idema]
@@ -323,42 +464,477 @@ async def datos_normales(
     if not api_keys_list:
         raise ValueError("Se requiere al menos una API key en 'api_keys'.")
 
-    all_results = []
+    clave_cache = ("normales", tuple(idemas))
+    if cache is not None:
+        en_cache = _consultar_cache(cache, clave_cache, compacto)
+        if en_cache is not None:
+            return en_cache
+
+    all_results = ResultadosCompactos() if compacto else []
+    unidades = _unidades_normales(idemas)
+    return await _descargar_unidades(
+        unidades, api_keys_list, all_results, workers_metadatos, workers_descargas,
+        almacen=almacen, tabla="normales",
+        cobertura=cobertura, plazo=plazo, cache=cache, clave_cache=clave_cache,
+    )
+
+
+async def inventario_estaciones(api_keys: Iterable[str]) -> list[dict]:
+    """Descarga el inventario de estaciones climatológicas de AEMET.
+
+    Args:
+        api_keys: Iterable con las claves API de AEMET.
+
+    Returns:
+        list: Un registro por estación (indicativo, nombre, provincia, ...).
+    """
+    api_keys_list = list(api_keys)
+    if not api_keys_list:
+        raise ValueError("Se requiere al menos una API key en 'api_keys'.")
+
+    unidades = [(
+        "https://opendata.aemet.es/opendata/api/valores/climatologicos/"
+        "inventarioestaciones/todasestaciones?api_key={apiKey}",
+        "climatologia_inventario",
+        "inventario de estaciones",
+    )]
+    return await _descargar_unidades(unidades, api_keys_list, [], 1, 1)
+
+
+def datos_diarios_multiproceso(
+    idema: str | Iterable[str],
+    fecha_inicio: str,
+    fecha_fin: str,
+    api_keys: Iterable[str],
+    salida,
+    procesos: int | None = None,
+    peticiones_por_minuto: float | None = None,
+    workers_metadatos: int = 1,
+    workers_descargas: int = 2,
+) -> dict:
+    """Descarga datos diarios repartiendo (estación, intervalo) entre procesos.
+
+    Pensada para cargas históricas grandes, en las que un único bucle de
+    eventos queda limitado por la decodificación de JSON. La cuota de cada
+    clave se comparte entre procesos. Es una función síncrona.
+
+    Args:
+        idema: Identificador de estación (IDEMA) o lista de identificadores.
+        fecha_inicio: Fecha inicial en formato 'AAAA-MM-DD' o 'AAAA-MM-DDTHH:MM:SSUTC'.
+        fecha_fin: Fecha final en formato 'AAAA-MM-DD' o 'AAAA-MM-DDTHH:MM:SSUTC'.
+        api_keys: Iterable con las claves API de AEMET.
+        salida: Ruta del fichero NDJSON de salida o fichero binario abierto.
+        procesos: Número de procesos (por defecto, el número de CPUs).
+        peticiones_por_minuto: Cuota por clave (por defecto la de AEMET).
+        workers_metadatos: Workers de metadatos por proceso.
+        workers_descargas: Workers de descarga por proceso.
+
+    Returns:
+        dict: ``{"registros": int, "fallidas": [tipo, ...]}``.
+    """
+    from ..utils.multiproceso import PETICIONES_POR_MINUTO_AEMET, descargar_multiproceso
+
+    if isinstance(idema, str):
+        idemas = [idema]
+    elif isinstance(idema, (list, tuple)):
+        idemas = list(idema)
+    else:
+        raise ValueError("El parámetro 'idema' debe ser str o iterable de str.")
+
+    if not idemas:
+        raise ValueError("El parámetro 'idema' es obligatorio.")
+
+    fecha_inicio = _completar_fecha(fecha_inicio, True)
+    fecha_fin = _completar_fecha(fecha_fin, False)
+    intervalos = _generar_intervalos_diarios(_parse_fecha(fecha_inicio), _parse_fecha(fecha_fin))
+
+    return descargar_multiproceso(
+        _unidades_diarias(idemas, intervalos),
+        api_keys,
+        salida,
+        procesos=procesos,
+        peticiones_por_minuto=peticiones_por_minuto or PETICIONES_POR_MINUTO_AEMET,
+        workers_metadatos=workers_metadatos,
+        workers_descargas=workers_descargas,
+    )
+
+
+def detectar_huecos(
+    registros: Iterable[dict],
+    idema: str | Iterable[str],
+    fecha_inicio: str,
+    fecha_fin: str,
+    confirmados: dict[str, Iterable] | None = None,
+) -> dict[str, list[date]]:
+    """Detecta los días sin dato en una serie climatológica diaria.
+
+    Compara los registros ya descargados con el índice de fechas esperado
+    para cada estación entre ``fecha_inicio`` y ``fecha_fin``.
+
+    Args:
+        registros: Registros diarios de AEMET (con claves 'indicativo' y 'fecha').
+        idema: Identificador de estación (IDEMA) o lista de identificadores.
+        fecha_inicio: Fecha inicial en formato 'AAAA-MM-DD' o 'AAAA-MM-DDTHH:MM:SSUTC'.
+        fecha_fin: Fecha final en formato 'AAAA-MM-DD' o 'AAAA-MM-DDTHH:MM:SSUTC'.
+        confirmados: ``{idema: fechas}`` (``date`` o 'AAAA-MM-DD') que AEMET ya
+            ha confirmado sin datos; no se cuentan como huecos.
+
+    Returns:
+        dict: {idema: [fechas sin dato]} con las fechas ordenadas. Solo incluye
+              las estaciones que tienen algún hueco.
+    """
+    if isinstance(idema, str):
+        idemas = [idema]
+    elif isinstance(idema, (list, tuple)):
+        idemas = list(idema)
+    else:
+        raise ValueError("El parámetro 'idema' debe ser str o iterable de str.")
+
+    dia_inicio = _parse_fecha(_completar_fecha(fecha_inicio, True)).date()
+    dia_fin = _parse_fecha(_completar_fecha(fecha_fin, False)).date()
+    if dia_inicio > dia_fin:
+        raise ValueError("'fecha_inicio' no puede ser mayor que 'fecha_fin'.")
+
+    presentes = {idema_item: set() for idema_item in idemas}
+    for idema_item, fechas in (confirmados or {}).items():
+        if idema_item in presentes:
+            presentes[idema_item].update(str(fecha)[:10] for fecha in fechas)
+    for registro in registros:
+        fechas_estacion = presentes.get(registro.get("indicativo"))
+        if fechas_estacion is not None and registro.get("fecha"):
+            fechas_estacion.add(registro["fecha"][:10])
+
+    huecos = {}
     for idema_item in idemas:
-        endpoint_template = (
-            "https://opendata.aemet.es/opendata/api/valores/climatologicos/normales/"
-            f"estacion/{idema_item}?api_key={{apiKey}}"
-        )
-        print(f"🔍 Solicitando valores normales para estación {idema_item}")
-        response = await fetch_con_reintentos_endpoint_aemet(
-            endpoint_template,
-            tipo=f"climatologia_normales_{idema_item}",
-            api_keys=api_keys_list,
-        )
-        if response.get("estado") != 200:
-            raise AemetError(
-                f"Error en AEMET: {response.get('descripcion', 'Error desconocido')} "
-                f"(estado: {response.get('estado')})"
-            )
-        datos_url = response.get("datos")
-        if not datos_url:
-            raise AemetError("No se encontró URL de descarga en la respuesta de AEMET")
-        print(f"✨ Descargando valores normales desde URL de AEMET: {datos_url}")
-        datos = await fetch_json_url(datos_url)
-        print(f"✅ Valores normales descargados exitosamente para estación {idema_item}")
-        if isinstance(datos, list):
-            all_results.extend(datos)
-        elif isinstance(datos, dict):
-            all_results.append(datos)
+        faltan = []
+        dia = dia_inicio
+        while dia <= dia_fin:
+            if dia.isoformat() not in presentes[idema_item]:
+                faltan.append(dia)
+            dia += timedelta(days=1)
+        if faltan:
+            huecos[idema_item] = faltan
+    return huecos
+
+
+def agrupar_huecos(fechas: Iterable[date]) -> list[tuple[date, date]]:
+    """Agrupa fechas sueltas en el menor número de ventanas de petición.
+
+    Cada ventana respeta el tamaño máximo que admite AEMET para datos diarios,
+    el mismo que usa :func:`datos_diarios` para trocear los rangos.
+
+    Args:
+        fechas: Fechas sin dato de una estación.
+
+    Returns:
+        list: Ventanas ``(inicio, fin)`` ordenadas y sin solapes.
+    """
+    ventanas = []
+    for fecha in sorted(set(fechas)):
+        if ventanas and fecha <= _fin_maximo_intervalo(ventanas[-1][0]):
+            ventanas[-1] = (ventanas[-1][0], fecha)
         else:
-            try:
-                data = json.loads(datos)
-                if isinstance(data, list):
-                    all_results.extend(data)
-                elif isinstance(data, dict):
-                    all_results.append(data)
-                else:
-                    all_results.append({'contenido': str(datos)})
-            except Exception:
-                all_results.append({'contenido': str(datos)})
+            ventanas.append((fecha, fecha))
+    return ventanas
+
+
+async def rellenar_huecos(
+    registros: list[dict],
+    idema: str | Iterable[str],
+    fecha_inicio: str,
+    fecha_fin: str,
+    api_keys: Iterable[str],
+    workers_metadatos: int = 1,
+    workers_descargas: int = 1,
+    confirmados: dict[str, Iterable] | None = None,
+) -> list[dict]:
+    """Completa una serie diaria descargando solo las ventanas con huecos.
+
+    En lugar de repetir :func:`datos_diarios` sobre todo el rango, detecta los
+    días que faltan por estación, los agrupa en el mínimo de ventanas y pide
+    únicamente esas ventanas a AEMET.
+
+    Args:
+        registros: Registros diarios ya descargados.
+        idema: Identificador de estación (IDEMA) o lista de identificadores.
+        fecha_inicio: Fecha inicial en formato 'AAAA-MM-DD' o 'AAAA-MM-DDTHH:MM:SSUTC'.
+        fecha_fin: Fecha final en formato 'AAAA-MM-DD' o 'AAAA-MM-DDTHH:MM:SSUTC'.
+        api_keys: Iterable con las claves API de AEMET.
+        workers_metadatos: Consultas de metadatos simultáneas.
+        workers_descargas: Descargas de ``datos`` simultáneas.
+        confirmados: Fechas ya confirmadas sin datos por estación (ver
+            :func:`detectar_huecos`); no se vuelven a pedir.
+
+    Returns:
+        list: Los registros de entrada más los nuevos, sin duplicar
+              (estación, fecha). Si ``registros`` es un ``ResultadosCompactos``
+              se devuelve otro ``ResultadosCompactos``.
+    """
+    all_results, _ = await _rellenar_huecos(
+        registros, idema, fecha_inicio, fecha_fin, api_keys,
+        workers_metadatos, workers_descargas, confirmados,
+    )
     return all_results
+
+
+async def _rellenar_huecos(
+    registros,
+    idema,
+    fecha_inicio,
+    fecha_fin,
+    api_keys,
+    workers_metadatos,
+    workers_descargas,
+    confirmados=None,
+):
+    """Implementa :func:`rellenar_huecos`.
+
+    Returns:
+        tuple: ``(registros completados, vacios)``, donde ``vacios`` es
+               ``{idema: [fechas]}`` con los huecos que AEMET ha confirmado
+               sin datos (su ventana respondió sin ellos o con "no hay datos").
+    """
+    api_keys_list = list(api_keys)
+    if not api_keys_list:
+        raise ValueError("Se requiere al menos una API key en 'api_keys'.")
+
+    huecos = detectar_huecos(registros, idema, fecha_inicio, fecha_fin, confirmados)
+    if isinstance(registros, ResultadosCompactos):
+        all_results = ResultadosCompactos(registros)
+    else:
+        all_results = list(registros)
+    if not huecos:
+        print("✅ La serie no tiene huecos")
+        return all_results, {}
+
+    vistos = {(r.get("indicativo"), (r.get("fecha") or "")[:10]) for r in registros}
+    unidades = []
+    # (estación, fechas sin dato) que cubre cada unidad.
+    cubiertas = []
+    for idema_item, fechas in huecos.items():
+        ventanas = agrupar_huecos(fechas)
+        print(
+            f"🧩 Estación {idema_item}: {len(fechas)} días sin dato en "
+            f"{len(ventanas)} ventana(s)"
+        )
+        for ventana_inicio, ventana_fin in ventanas:
+            unidades.append(_unidad_diaria(idema_item, ventana_inicio, ventana_fin))
+            cubiertas.append((
+                idema_item,
+                [fecha for fecha in fechas if ventana_inicio <= fecha <= ventana_fin],
+            ))
+
+    # AEMET responde "no hay datos" cuando una ventana está vacía: el hueco
+    # es real y no se puede rellenar, así que esas ventanas se omiten.
+    errores = {}
+    async for _, datos in iterar_pipeline(
+        unidades,
+        api_keys_list,
+        workers_metadatos=workers_metadatos,
+        workers_descargas=workers_descargas,
+        ordenado=True,
+        omitir_errores=True,
+        errores=errores,
+    ):
+        nuevos = []
+        _anadir_resultados(nuevos, datos)
+        for registro in nuevos:
+            clave = (registro.get("indicativo"), (registro.get("fecha") or "")[:10])
+            if clave not in vistos:
+                vistos.add(clave)
+                all_results.append(registro)
+
+    # Los huecos de ventanas que han respondido (con datos o con "no hay
+    # datos") y siguen sin dato están confirmados; los de ventanas con otros
+    # errores (cuota, timeouts) quedan pendientes.
+    vacios = {}
+    for indice, (idema_item, fechas) in enumerate(cubiertas):
+        error = errores.get(indice)
+        if error is not None and not isinstance(error, AemetSinDatos):
+            continue
+        faltan = [fecha for fecha in fechas if (idema_item, fecha.isoformat()) not in vistos]
+        if faltan:
+            vacios.setdefault(idema_item, []).extend(faltan)
+    return all_results, vacios
+
+
+async def consultar_diarios(
+    almacen: AlmacenSQLite,
+    idema: str | Iterable[str],
+    fecha_inicio: str,
+    fecha_fin: str,
+    api_keys: Iterable[str] | None = None,
+    workers_metadatos: int = 1,
+    workers_descargas: int = 1,
+    ttl_huecos: float | None = 7 * 24 * 3600,
+) -> list[dict]:
+    """Datos diarios servidos desde el almacén local, completando lo que falte.
+
+    Lee primero del almacén. Si hay claves API, los días que faltan se piden
+    a AEMET en el mínimo de ventanas (ver :func:`rellenar_huecos`) y se
+    guardan en el almacén; sin claves, solo se devuelve lo local. Los días
+    que AEMET confirma sin datos se anotan en el almacén y no se vuelven a
+    pedir hasta que pasa ``ttl_huecos``.
+
+    Args:
+        almacen: Almacén SQLite.
+        idema: Identificador de estación (IDEMA) o lista de identificadores.
+        fecha_inicio: Fecha inicial en formato 'AAAA-MM-DD' o 'AAAA-MM-DDTHH:MM:SSUTC'.
+        fecha_fin: Fecha final en formato 'AAAA-MM-DD' o 'AAAA-MM-DDTHH:MM:SSUTC'.
+        api_keys: Claves API de AEMET (opcional).
+        workers_metadatos: Consultas de metadatos simultáneas.
+        workers_descargas: Descargas de ``datos`` simultáneas.
+        ttl_huecos: Segundos durante los que un día confirmado sin datos no se
+            vuelve a pedir (por defecto una semana; None para siempre).
+
+    Returns:
+        list: Registros diarios ordenados por estación y fecha.
+    """
+    if isinstance(idema, str):
+        idemas = [idema]
+    elif isinstance(idema, (list, tuple)):
+        idemas = list(idema)
+    else:
+        raise ValueError("El parámetro 'idema' debe ser str o iterable de str.")
+
+    dia_inicio = _completar_fecha(fecha_inicio, True)[:10]
+    dia_fin = _completar_fecha(fecha_fin, False)[:10]
+    locales = []
+    for idema_item in idemas:
+        locales.extend(almacen.consultar("diarios", idema_item, dia_inicio, dia_fin))
+
+    api_keys_list = list(api_keys or [])
+    if not api_keys_list:
+        return locales
+    confirmados = {
+        idema_item: almacen.huecos_confirmados("diarios", idema_item, dia_inicio, dia_fin, ttl=ttl_huecos)
+        for idema_item in idemas
+    }
+    if not detectar_huecos(locales, idemas, fecha_inicio, fecha_fin, confirmados):
+        return locales
+
+    completos, vacios = await _rellenar_huecos(
+        locales, idemas, fecha_inicio, fecha_fin, api_keys_list,
+        workers_metadatos, workers_descargas, confirmados,
+    )
+    almacen.guardar("diarios", completos[len(locales):])
+    almacen.confirmar()
+    for idema_item, fechas in vacios.items():
+        almacen.confirmar_huecos("diarios", idema_item, [fecha.isoformat() for fecha in fechas])
+    return sorted(completos, key=lambda r: (r.get("indicativo", ""), r.get("fecha", "")))
+
+
+async def consultar_mensuales(
+    almacen: AlmacenSQLite,
+    idema: str | Iterable[str],
+    anio_inicio: int,
+    anio_fin: int,
+    api_keys: Iterable[str] | None = None,
+    workers_metadatos: int = 1,
+    workers_descargas: int = 1,
+    ttl_huecos: float | None = 7 * 24 * 3600,
+) -> list[dict]:
+    """Datos mensuales servidos desde el almacén local, completando lo que falte.
+
+    Un año se considera completo si el almacén tiene sus 12 meses y el
+    resumen anual. Si hay claves API, solo los años incompletos se piden a
+    AEMET y se guardan en el almacén. Un año que sigue incompleto después de
+    pedirlo (el año en curso, estaciones cerradas) se anota como comprobado
+    y no se vuelve a pedir hasta que pasa ``ttl_huecos``.
+
+    Args:
+        almacen: Almacén SQLite.
+        idema: Identificador de estación (IDEMA) o lista de identificadores.
+        anio_inicio: Año inicial (incluido).
+        anio_fin: Año final (incluido).
+        api_keys: Claves API de AEMET (opcional).
+        workers_metadatos: Consultas de metadatos simultáneas.
+        workers_descargas: Descargas de ``datos`` simultáneas.
+        ttl_huecos: Segundos durante los que un año comprobado incompleto no
+            se vuelve a pedir (por defecto una semana; None para siempre).
+
+    Returns:
+        list: Registros mensuales ordenados por estación y periodo.
+    """
+    if isinstance(idema, str):
+        idemas = [idema]
+    elif isinstance(idema, (list, tuple)):
+        idemas = list(idema)
+    else:
+        raise ValueError("El parámetro 'idema' debe ser str o iterable de str.")
+
+    if anio_inicio > anio_fin:
+        raise ValueError("'anio_inicio' no puede ser mayor que 'anio_fin'.")
+
+    def consultar_local():
+        registros = []
+        for idema_item in idemas:
+            registros.extend(
+                almacen.consultar("mensuales", idema_item, f"{anio_inicio}-01", f"{anio_fin}-13")
+            )
+        return registros
+
+    locales = consultar_local()
+    api_keys_list = list(api_keys or [])
+    if not api_keys_list:
+        return locales
+
+    def meses_por_anio(registros):
+        meses = {}
+        for registro in registros:
+            anio, _, mes = str(registro.get("fecha", "")).partition("-")
+            meses.setdefault((registro.get("indicativo"), anio), set()).add(mes)
+        return meses
+
+    meses = meses_por_anio(locales)
+    unidades = []
+    # (estación, año inicial, año final) de cada unidad.
+    origen = []
+    for idema_item in idemas:
+        comprobados = almacen.huecos_confirmados(
+            "mensuales", idema_item, str(anio_inicio), str(anio_fin), ttl=ttl_huecos
+        )
+        incompletos = [
+            anio for anio in range(anio_inicio, anio_fin + 1)
+            if len(meses.get((idema_item, str(anio)), ())) < 13 and str(anio) not in comprobados
+        ]
+        # Agrupa años consecutivos; _unidades_mensuales los trocea en bloques de 3.
+        tramos = []
+        for anio in incompletos:
+            if tramos and anio == tramos[-1][1] + 1:
+                tramos[-1][1] = anio
+            else:
+                tramos.append([anio, anio])
+        for primero, ultimo in tramos:
+            for unidad in _unidades_mensuales([idema_item], primero, ultimo):
+                _, anio_ini, anio_fin_unidad = unidad[1].rsplit("_", 2)
+                unidades.append(unidad)
+                origen.append((idema_item, int(anio_ini), int(anio_fin_unidad)))
+
+    if not unidades:
+        return locales
+
+    errores = {}
+    async for _, datos in iterar_pipeline(
+        unidades,
+        api_keys_list,
+        workers_metadatos=workers_metadatos,
+        workers_descargas=workers_descargas,
+        omitir_errores=True,
+        errores=errores,
+    ):
+        registros = []
+        _anadir_resultados(registros, datos)
+        almacen.guardar("mensuales", registros)
+
+    resultado = consultar_local()
+    meses = meses_por_anio(resultado)
+    for indice, (idema_item, primero, ultimo) in enumerate(origen):
+        error = errores.get(indice)
+        if error is not None and not isinstance(error, AemetSinDatos):
+            continue
+        almacen.confirmar_huecos("mensuales", idema_item, [
+            str(anio) for anio in range(primero, ultimo + 1)
+            if len(meses.get((idema_item, str(anio)), ())) < 13
+        ])
+    return resultado
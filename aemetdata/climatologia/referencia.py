@@ -0,0 +1,218 @@
+"""Referencia local de valores normales y extremos de todas las estaciones.
+
+Los valores normales (1991-2020) y extremos apenas cambian, pero cada
+consulta a AEMET cuesta dos peticiones por estación y parámetro. Este
+módulo los descarga una sola vez para todo el inventario de estaciones y
+los guarda en un fichero comprimido indexado por estación; las consultas
+posteriores se sirven desde memoria.
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+import os
+from datetime import datetime
+from typing import Iterable
+
+from ..utils.pipeline import iterar_pipeline
+from . import _unidades_extremos, _unidades_normales, inventario_estaciones
+
+
+PARAMETROS_EXTREMOS = ["P", "T", "V"]
+
+RUTA_REFERENCIA_POR_DEFECTO = os.path.join(
+    os.path.expanduser("~"), ".aemetdata", "referencia_climatologica.json.gz"
+)
+
+
+def _ruta_referencia(ruta: str | None) -> str:
+    return ruta or os.environ.get("AEMET_REFERENCIA") or RUTA_REFERENCIA_POR_DEFECTO
+
+
+async def precargar_referencia(
+    api_keys: Iterable[str],
+    ruta: str | None = None,
+    estaciones: Iterable[str] | None = None,
+    workers_metadatos: int = 2,
+    workers_descargas: int = 4,
+    limitador=None,
+) -> str:
+    """Descarga normales y extremos de todas las estaciones y los guarda en disco.
+
+    Es la operación de refresco de la referencia: sobrescribe el fichero
+    existente de forma atómica. Las consultas que fallan (cuota agotada,
+    timeouts o estaciones sin datos) se informan al final y, si la
+    referencia anterior tenía esos datos, se conservan; así un refresco
+    parcial nunca deja la referencia con menos estaciones que antes.
+
+    Args:
+        api_keys: Iterable con las claves API de AEMET.
+        ruta: Fichero de la referencia (por defecto ``$AEMET_REFERENCIA`` o
+            ``~/.aemetdata/referencia_climatologica.json.gz``).
+        estaciones: Estaciones a incluir (por defecto, todo el inventario).
+        workers_metadatos: Consultas de metadatos simultáneas.
+        workers_descargas: Descargas de ``datos`` simultáneas.
+        limitador: Limitador de cuota por clave opcional (ver
+            :class:`aemetdata.utils.multiproceso.CuotaCompartida`).
+
+    Returns:
+        str: Ruta del fichero generado.
+    """
+    api_keys_list = list(api_keys)
+    if not api_keys_list:
+        raise ValueError("Se requiere al menos una API key en 'api_keys'.")
+
+    if estaciones is None:
+        inventario = await inventario_estaciones(api_keys_list)
+        idemas = [estacion["indicativo"] for estacion in inventario if estacion.get("indicativo")]
+    else:
+        idemas = list(estaciones)
+
+    unidades = _unidades_normales(idemas) + _unidades_extremos(idemas, PARAMETROS_EXTREMOS)
+    # (tipo de dato, estación, parámetro) de cada unidad, en el mismo orden.
+    claves = [("normales", idema_item, None) for idema_item in idemas] + [
+        ("extremos", idema_item, parametro)
+        for idema_item in idemas
+        for parametro in PARAMETROS_EXTREMOS
+    ]
+
+    normales: dict[str, list] = {}
+    extremos: dict[str, dict] = {}
+    recibidas = set()
+    print(f"📚 Precargando normales y extremos de {len(idemas)} estaciones")
+    async for indice, datos in iterar_pipeline(
+        unidades,
+        api_keys_list,
+        workers_metadatos=workers_metadatos,
+        workers_descargas=workers_descargas,
+        omitir_errores=True,
+        limitador=limitador,
+    ):
+        recibidas.add(indice)
+        tipo, idema_item, parametro = claves[indice]
+        if tipo == "normales":
+            normales[idema_item] = datos if isinstance(datos, list) else [datos]
+        else:
+            extremos.setdefault(idema_item, {})[parametro] = datos
+
+    ruta = _ruta_referencia(ruta)
+    fallidas = [claves[indice] for indice in range(len(claves)) if indice not in recibidas]
+    if fallidas:
+        anterior = _leer_referencia_anterior(ruta)
+        conservadas = 0
+        for tipo, idema_item, parametro in fallidas:
+            if tipo == "normales" and idema_item in anterior.get("normales", {}):
+                normales[idema_item] = anterior["normales"][idema_item]
+                conservadas += 1
+            elif tipo == "extremos" and parametro in anterior.get("extremos", {}).get(idema_item, {}):
+                extremos.setdefault(idema_item, {})[parametro] = anterior["extremos"][idema_item][parametro]
+                conservadas += 1
+        print(
+            f"⚠️ {len(fallidas)} consultas fallidas: {conservadas} se conservan de la "
+            f"referencia anterior y {len(fallidas) - conservadas} quedan sin datos"
+        )
+        for tipo, idema_item, parametro in fallidas[:20]:
+            print(f"   - {tipo} {idema_item}{f' ({parametro})' if parametro else ''}")
+        if len(fallidas) > 20:
+            print(f"   ... y {len(fallidas) - 20} más")
+
+    directorio = os.path.dirname(ruta)
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+    contenido = {
+        "generado": datetime.now().isoformat(timespec="seconds"),
+        "normales": normales,
+        "extremos": extremos,
+        # Consultas que fallaron en este refresco (con datos conservados o no).
+        "fallidas": [list(clave) for clave in fallidas],
+    }
+    temporal = f"{ruta}.tmp"
+    with gzip.open(temporal, "wt", encoding="utf-8") as f:
+        json.dump(contenido, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(temporal, ruta)
+    _referencias.pop(ruta, None)
+    print(
+        f"✅ Referencia guardada en {ruta} "
+        f"({len(normales)} estaciones con normales, {len(extremos)} con extremos)"
+    )
+    return ruta
+
+
+def _leer_referencia_anterior(ruta: str) -> dict:
+    """Contenido de la referencia existente, o vacío si no hay o no se puede leer."""
+    if not os.path.exists(ruta):
+        return {}
+    try:
+        with gzip.open(ruta, "rt", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ No se pudo leer la referencia anterior ({e}); no se conserva nada de ella")
+        return {}
+
+
+class ReferenciaClimatologica:
+    """Normales y extremos precargados, indexados por estación.
+
+    Se obtiene con :func:`cargar_referencia`. Las consultas devuelven copias,
+    de modo que modificar el resultado no altera la referencia compartida.
+    """
+
+    def __init__(self, contenido: dict):
+        self.generado = contenido.get("generado")
+        # Consultas (tipo, estación, parámetro) que fallaron en el último refresco.
+        self.fallidas = [tuple(clave) for clave in contenido.get("fallidas", [])]
+        self._normales = contenido.get("normales", {})
+        self._extremos = contenido.get("extremos", {})
+
+    def estaciones(self) -> list[str]:
+        """Estaciones presentes en la referencia."""
+        return sorted(set(self._normales) | set(self._extremos))
+
+    def normales(self, idema: str) -> list[dict]:
+        """Valores normales de una estación (un registro por mes y el anual).
+
+        Raises:
+            KeyError: Si la estación no tiene normales en la referencia.
+        """
+        return [dict(registro) for registro in self._normales[idema]]
+
+    def extremos(self, idema: str, parametro: str | None = None) -> dict:
+        """Valores extremos de una estación.
+
+        Args:
+            idema: Identificador de estación (IDEMA).
+            parametro: 'P', 'T' o 'V'. Si no se indica, devuelve
+                ``{parametro: registro}`` con todos los disponibles.
+
+        Raises:
+            KeyError: Si la estación o el parámetro no están en la referencia.
+        """
+        por_parametro = self._extremos[idema]
+        if parametro is not None:
+            return dict(por_parametro[parametro])
+        return {clave: dict(registro) for clave, registro in por_parametro.items()}
+
+
+_referencias: dict[str, ReferenciaClimatologica] = {}
+
+
+def cargar_referencia(ruta: str | None = None) -> ReferenciaClimatologica:
+    """Carga la referencia desde disco (una sola vez por proceso y ruta).
+
+    Raises:
+        FileNotFoundError: Si todavía no se ha generado con
+            :func:`precargar_referencia`.
+    """
+    ruta = _ruta_referencia(ruta)
+    referencia = _referencias.get(ruta)
+    if referencia is None:
+        if not os.path.exists(ruta):
+            raise FileNotFoundError(
+                f"No existe la referencia '{ruta}'. Genérala con precargar_referencia() "
+                "o 'python -m aemetdata.cli --refrescar-referencia'."
+            )
+        with gzip.open(ruta, "rt", encoding="utf-8") as f:
+            referencia = ReferenciaClimatologica(json.load(f))
+        _referencias[ruta] = referencia
+    return referencia
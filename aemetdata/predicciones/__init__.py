@@ -0,0 +1,374 @@
+"""Módulo de predicciones municipales de AEMET.
+
+Descarga en bloque las predicciones diarias y horarias de listas de
+municipios (hasta los ~8.100 de España) con el pipeline de dos etapas, y
+las reduce a un registro compacto por municipio según van llegando.
+"""
+
+
+from __future__ import annotations
+
+from typing import Iterable
+
+from ..utils.suport_functions import (
+    fetch_con_reintentos_endpoint_aemet,
+    fetch_json_url,
+    AemetError,
+)
+from ..utils.pipeline import iterar_pipeline
+from ..utils.resultados import ResultadosCompactos
+
+
+TIPOS_PREDICCION = ("diaria", "horaria")
+
+
+def _codigo_municipio(municipio) -> str:
+    """Normaliza un código INE de municipio: '28079', 28079 o 'id28079'."""
+    if isinstance(municipio, int):
+        codigo = f"{municipio:05d}"
+    else:
+        codigo = str(municipio).strip()
+        if codigo.startswith("id"):
+            codigo = codigo[2:]
+    if len(codigo) != 5 or not codigo.isdigit():
+        raise ValueError(
+            f"Código de municipio '{municipio}' no válido. "
+            "Se espera el código INE de 5 dígitos (ej: '28079')."
+        )
+    return codigo
+
+
+def _unidad_prediccion(codigo, tipo):
+    endpoint_template = (
+        f"https://opendata.aemet.es/opendata/api/prediccion/especifica/municipio/{tipo}/{codigo}"
+        "?api_key={apiKey}"
+    )
+    return (
+        endpoint_template,
+        f"prediccion_{tipo}_{codigo}",
+        f"predicción {tipo} para municipio {codigo}",
+    )
+
+
+def _unidades_predicciones(codigos, tipo):
+    return [_unidad_prediccion(codigo, tipo) for codigo in codigos]
+
+
+def _numero(valor):
+    """Convierte los valores de AEMET (números o textos) a int/float.
+
+    Los vacíos pasan a None y los textos no numéricos (como 'Ip', precipitación
+    inapreciable) se conservan tal cual.
+    """
+    if valor is None or isinstance(valor, (int, float)):
+        return valor
+    valor = str(valor).strip()
+    if not valor:
+        return None
+    try:
+        return int(valor)
+    except ValueError:
+        pass
+    try:
+        return float(valor.replace(",", "."))
+    except ValueError:
+        return valor
+
+
+def _valor_dia(elementos, campo="value"):
+    """Valor de un elemento diario: el del periodo 00-24 o, si no hay, el primero."""
+    if not elementos:
+        return None
+    elegido = elementos[0]
+    for elemento in elementos:
+        if elemento.get("periodo") in (None, "00-24"):
+            elegido = elemento
+            break
+    return elegido.get(campo)
+
+
+def _por_hora(elementos, campo="value"):
+    return {elemento.get("periodo"): elemento.get(campo) for elemento in elementos or []}
+
+
+def _parsear_dia(dia: dict) -> dict:
+    temperatura = dia.get("temperatura") or {}
+    sens_termica = dia.get("sensTermica") or {}
+    humedad = dia.get("humedadRelativa") or {}
+    viento = dia.get("viento") or []
+    return {
+        "fecha": (dia.get("fecha") or "")[:10],
+        "temp_max": _numero(temperatura.get("maxima")),
+        "temp_min": _numero(temperatura.get("minima")),
+        "sens_termica_max": _numero(sens_termica.get("maxima")),
+        "sens_termica_min": _numero(sens_termica.get("minima")),
+        "humedad_max": _numero(humedad.get("maxima")),
+        "humedad_min": _numero(humedad.get("minima")),
+        "prob_precipitacion": _numero(_valor_dia(dia.get("probPrecipitacion"))),
+        "cota_nieve": _numero(_valor_dia(dia.get("cotaNieveProv"))),
+        "estado_cielo": _valor_dia(dia.get("estadoCielo"), "descripcion") or None,
+        "viento_direccion": _valor_dia(viento, "direccion") or None,
+        "viento_velocidad": _numero(_valor_dia(viento, "velocidad")),
+        "racha_max": _numero(_valor_dia(dia.get("rachaMax"))),
+        "uv_max": _numero(dia.get("uvMax")),
+    }
+
+
+def _parsear_horas(dia: dict) -> list[dict]:
+    fecha = (dia.get("fecha") or "")[:10]
+    series = {
+        "temperatura": _por_hora(dia.get("temperatura")),
+        "sens_termica": _por_hora(dia.get("sensTermica")),
+        "humedad": _por_hora(dia.get("humedadRelativa")),
+        "precipitacion": _por_hora(dia.get("precipitacion")),
+        "nieve": _por_hora(dia.get("nieve")),
+    }
+    estado_cielo = _por_hora(dia.get("estadoCielo"), "descripcion")
+    # vientoAndRachaMax alterna elementos de viento (dirección y velocidad
+    # en listas) y de racha máxima ('value') para la misma hora.
+    viento, racha = {}, {}
+    for elemento in dia.get("vientoAndRachaMax") or []:
+        if "value" in elemento:
+            racha[elemento.get("periodo")] = elemento["value"]
+        else:
+            viento[elemento.get("periodo")] = elemento
+    horas = []
+    for hora in sorted(series["temperatura"]):
+        if hora is None:
+            continue
+        viento_hora = viento.get(hora) or {}
+        registro = {"fecha_hora": f"{fecha}T{hora}"}
+        for nombre, valores in series.items():
+            registro[nombre] = _numero(valores.get(hora))
+        registro["estado_cielo"] = estado_cielo.get(hora) or None
+        registro["viento_direccion"] = (viento_hora.get("direccion") or [None])[0]
+        registro["viento_velocidad"] = _numero((viento_hora.get("velocidad") or [None])[0])
+        registro["racha_max"] = _numero(racha.get(hora))
+        horas.append(registro)
+    return horas
+
+
+def _parsear_prediccion(datos, tipo: str) -> dict:
+    """Reduce la respuesta de AEMET a un registro compacto por municipio.
+
+    Returns:
+        dict: Claves 'municipio', 'nombre', 'provincia', 'elaborado', 'tipo' y
+              'dias' (diaria) u 'horas' (horaria).
+
+    Raises:
+        AemetError: Si la respuesta no tiene la estructura esperada.
+    """
+    if isinstance(datos, list):
+        if not datos:
+            raise AemetError("Predicción vacía")
+        datos = datos[0]
+    if not isinstance(datos, dict) or "prediccion" not in datos:
+        raise AemetError(f"Respuesta de predicción inesperada: {str(datos)[:200]}")
+    dias = (datos.get("prediccion") or {}).get("dia") or []
+    registro = {
+        "municipio": str(datos.get("id", "")),
+        "nombre": datos.get("nombre"),
+        "provincia": datos.get("provincia"),
+        "elaborado": datos.get("elaborado"),
+        "tipo": tipo,
+    }
+    if tipo == "diaria":
+        registro["dias"] = [_parsear_dia(dia) for dia in dias]
+    else:
+        registro["horas"] = [hora for dia in dias for hora in _parsear_horas(dia)]
+    return registro
+
+
+def _validar_tipo(tipo: str) -> None:
+    if tipo not in TIPOS_PREDICCION:
+        raise ValueError(
+            f"Tipo de predicción '{tipo}' no válido. "
+            f"Tipos válidos: {', '.join(TIPOS_PREDICCION)}"
+        )
+
+
+async def maestro_municipios(api_keys: Iterable[str]) -> list[dict]:
+    """Descarga el maestro de municipios de AEMET.
+
+    Cada municipio trae, entre otros, 'id' (por ejemplo 'id28079'), 'nombre',
+    'latitud_dec', 'longitud_dec' y 'altitud'. Los 'id' pueden pasarse tal
+    cual a :func:`predicciones_municipios`.
+
+    Args:
+        api_keys: Iterable con las claves API de AEMET.
+
+    Returns:
+        list[dict]: Un registro por municipio.
+    """
+    api_keys_list = list(api_keys)
+    if not api_keys_list:
+        raise ValueError("Se requiere al menos una API key en 'api_keys'.")
+
+    respuesta = await fetch_con_reintentos_endpoint_aemet(
+        "https://opendata.aemet.es/opendata/api/maestro/municipios?api_key={apiKey}",
+        tipo="maestro_municipios",
+        api_keys=api_keys_list,
+    )
+    # El maestro se sirve directamente, sin el paso intermedio de 'datos'.
+    if isinstance(respuesta, list):
+        return respuesta
+    if isinstance(respuesta, dict) and respuesta.get("estado") == 200 and respuesta.get("datos"):
+        return await fetch_json_url(respuesta["datos"], descripcion="maestro de municipios")
+    raise AemetError(f"Respuesta inesperada de AEMET: {str(respuesta)[:200]}")
+
+
+async def iterar_predicciones(
+    municipios: Iterable,
+    api_keys: Iterable[str],
+    tipo: str = "diaria",
+    workers_metadatos: int | None = None,
+    workers_descargas: int = 16,
+    omitir_errores: bool = True,
+    limitador=None,
+    cobertura=None,
+    plazo: float | None = None,
+):
+    """Descarga predicciones de muchos municipios y las entrega según llegan.
+
+    Cada respuesta se reduce a su registro compacto en cuanto se descarga,
+    así que en memoria solo hay las respuestas en vuelo. El orden de entrega
+    es el de llegada, no el de ``municipios``.
+
+    Args:
+        municipios: Códigos INE de municipio ('28079', 28079 o 'id28079').
+        api_keys: Iterable con las claves API de AEMET.
+        tipo: 'diaria' u 'horaria'.
+        workers_metadatos: Consultas de metadatos simultáneas. Son las que
+            consumen cuota. Por defecto, dos por clave, para que una
+            respuesta lenta no deje sin usar el turno de su clave (los
+            workers de más solo esperan cuota).
+        workers_descargas: Descargas de ``datos`` simultáneas.
+        omitir_errores: Si es True (por defecto), los municipios que fallan
+            se avisan y se omiten; si no, el primer error se propaga.
+        limitador: Limitador de cuota por clave. Por defecto se crea una
+            :class:`aemetdata.utils.multiproceso.CuotaCompartida` para esta
+            llamada; pasa una compartida si hay varios procesos o llamadas
+            simultáneas con las mismas claves.
+        cobertura: ``Cobertura`` opcional para duplicar metadatos lentos.
+        plazo: Segundos máximos por municipio (metadatos más descarga).
+
+    Yields:
+        dict: Registro compacto del municipio (ver :func:`predicciones_municipios`).
+
+    Example:
+        >>> async for prediccion in iterar_predicciones(["28079", "08019"], [API_KEY]):
+        ...     print(prediccion["nombre"], prediccion["dias"][0]["temp_max"])
+    """
+    _validar_tipo(tipo)
+    codigos = [_codigo_municipio(municipio) for municipio in municipios]
+    if not codigos:
+        raise ValueError("El parámetro 'municipios' es obligatorio.")
+
+    api_keys_list = list(api_keys)
+    if not api_keys_list:
+        raise ValueError("Se requiere al menos una API key en 'api_keys'.")
+
+    if limitador is None:
+        # Sin limitador todas las peticiones empezarían por la primera clave.
+        from ..utils.multiproceso import CuotaCompartida
+
+        limitador = CuotaCompartida(len(api_keys_list))
+    if workers_metadatos is None:
+        workers_metadatos = 2 * len(api_keys_list)
+
+    async def descargar_y_parsear(url):
+        return _parsear_prediccion(await fetch_json_url(url), tipo)
+
+    async for indice, registro in iterar_pipeline(
+        _unidades_predicciones(codigos, tipo),
+        api_keys_list,
+        descargar=descargar_y_parsear,
+        workers_metadatos=workers_metadatos,
+        workers_descargas=workers_descargas,
+        omitir_errores=omitir_errores,
+        limitador=limitador,
+        cobertura=cobertura,
+        plazo=plazo,
+    ):
+        registro["municipio"] = codigos[indice]
+        yield registro
+
+
+async def predicciones_municipios(
+    municipios: Iterable,
+    api_keys: Iterable[str],
+    tipo: str = "diaria",
+    compacto: bool = False,
+    workers_metadatos: int | None = None,
+    workers_descargas: int = 16,
+    omitir_errores: bool = True,
+    limitador=None,
+    cobertura=None,
+    plazo: float | None = None,
+):
+    """Descarga en bloque las predicciones diarias u horarias de varios municipios.
+
+    Cada municipio son dos peticiones (metadatos y ``datos``). Las de
+    metadatos consumen cuota y se reparten entre las claves (ver
+    ``limitador``), así que el tiempo de un refresco nacional (~8.100 municipios) es como mínimo
+    ``municipios / (50 * claves)`` minutos: 14,7 con 11 claves, sin margen
+    para reintentos. Para una ventana de 15 minutos conviene contar con 12
+    claves (13,5 minutos), o 24 si se refrescan diaria y horaria.
+
+    Args:
+        municipios: Códigos INE de municipio ('28079', 28079 o 'id28079').
+        api_keys: Iterable con las claves API de AEMET.
+        tipo: 'diaria' u 'horaria'.
+        compacto: Si es True, devuelve un ``ResultadosCompactos`` con una fila
+            por municipio y día (u hora), en lugar de un dict por municipio.
+        workers_metadatos: Consultas de metadatos simultáneas (por defecto,
+            dos por clave).
+        workers_descargas: Descargas de ``datos`` simultáneas.
+        omitir_errores: Si es True (por defecto), los municipios que fallan
+            se avisan y se omiten.
+        limitador: Limitador de cuota por clave (por defecto, uno propio de
+            la llamada; ver :func:`iterar_predicciones`).
+        cobertura: ``Cobertura`` opcional para duplicar metadatos lentos.
+        plazo: Segundos máximos por municipio (metadatos más descarga).
+
+    Returns:
+        dict | ResultadosCompactos: ``{codigo: registro}`` donde cada registro
+        tiene 'municipio', 'nombre', 'provincia', 'elaborado', 'tipo' y la
+        lista 'dias' (fecha, temperaturas y sensación térmica máx./mín.,
+        humedad, probabilidad de precipitación, cota de nieve, estado del
+        cielo, viento, racha máxima, UV) u 'horas' (fecha_hora, temperatura,
+        sensación térmica, humedad, precipitación, nieve, estado del cielo,
+        viento, racha máxima).
+
+    Example:
+        >>> lista = await maestro_municipios([API_KEY])
+        >>> predicciones = await predicciones_municipios([m["id"] for m in lista], CLAVES)
+        >>> predicciones["28079"]["dias"][0]
+    """
+    resultados = ResultadosCompactos() if compacto else {}
+    descargados = 0
+    async for registro in iterar_predicciones(
+        municipios,
+        api_keys,
+        tipo=tipo,
+        workers_metadatos=workers_metadatos,
+        workers_descargas=workers_descargas,
+        omitir_errores=omitir_errores,
+        limitador=limitador,
+        cobertura=cobertura,
+        plazo=plazo,
+    ):
+        descargados += 1
+        if not compacto:
+            resultados[registro["municipio"]] = registro
+            continue
+        cabecera = {
+            "municipio": registro["municipio"],
+            "nombre": registro["nombre"],
+            "provincia": registro["provincia"],
+            "elaborado": registro["elaborado"],
+        }
+        for fila in registro["dias" if tipo == "diaria" else "horas"]:
+            resultados.append({**cabecera, **fila})
+    print(f"✅ Predicciones {tipo}s descargadas: {descargados} municipio(s)")
+    return resultados
@@ -0,0 +1,219 @@
+"""Almacén local SQLite para registros climatológicos.
+
+Guarda cada registro de AEMET como JSON indexado por (estación, periodo),
+con inserción/actualización (upsert) en lotes dentro de una transacción.
+Las consultas puntuales o por rango de una estación se resuelven con la
+clave primaria, sin volver a llamar a AEMET ni recorrer ficheros.
+"""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+import time
+from typing import Iterable
+
+
+# Tablas disponibles y campo del registro que da el periodo.
+# En 'extremos' el periodo es el parámetro (P, T, V) y lo indica quien guarda.
+TABLAS = {
+    "diarios": "fecha",
+    "mensuales": "fecha",
+    "normales": "mes",
+    "extremos": None,
+}
+
+
+def _periodo(tabla: str, valor) -> str:
+    valor = str(valor)
+    if tabla == "diarios":
+        return valor[:10]
+    if tabla == "mensuales":
+        # '2020-1' -> '2020-01' para que el orden de texto sea cronológico.
+        anio, _, mes = valor.partition("-")
+        return f"{anio}-{int(mes):02d}" if mes.isdigit() else valor
+    if tabla == "normales":
+        return f"{int(valor):02d}" if valor.isdigit() else valor
+    return valor
+
+
+class AlmacenSQLite:
+    """Almacén de registros climatológicos en un fichero SQLite.
+
+    Los registros se acumulan y se escriben en lotes de ``tamano_lote``
+    dentro de una única transacción; :meth:`confirmar` fuerza la escritura
+    de lo pendiente. Puede usarse como gestor de contexto.
+
+    Args:
+        ruta: Fichero SQLite (se crea si no existe). ``":memory:"`` para
+            un almacén temporal.
+        tamano_lote: Registros pendientes que provocan una escritura.
+
+    Example:
+        >>> almacen = AlmacenSQLite("aemet.sqlite")
+        >>> await datos_diarios("3195", "2015-01-01", "2015-12-31", [API_KEY], almacen=almacen)
+        >>> almacen.consultar("diarios", "3195", "2015-03-01", "2015-03-31")
+    """
+
+    def __init__(self, ruta: str, tamano_lote: int = 5000):
+        self.ruta = ruta
+        self.tamano_lote = tamano_lote
+        self._pendientes: dict[str, list[tuple[str, str, str]]] = {tabla: [] for tabla in TABLAS}
+        self._conexion = sqlite3.connect(ruta)
+        self._conexion.execute("PRAGMA journal_mode=WAL")
+        self._conexion.execute("PRAGMA synchronous=NORMAL")
+        with self._conexion:
+            for tabla in TABLAS:
+                self._conexion.execute(
+                    f"CREATE TABLE IF NOT EXISTS {tabla} ("
+                    "idema TEXT NOT NULL, periodo TEXT NOT NULL, datos TEXT NOT NULL, "
+                    "PRIMARY KEY (idema, periodo)) WITHOUT ROWID"
+                )
+                self._conexion.execute(
+                    f"CREATE INDEX IF NOT EXISTS {tabla}_periodo ON {tabla} (periodo)"
+                )
+            # Periodos que AEMET ha confirmado que no tienen datos, con el
+            # instante de la comprobación, para no volver a pedirlos.
+            self._conexion.execute(
+                "CREATE TABLE IF NOT EXISTS huecos_confirmados ("
+                "tabla TEXT NOT NULL, idema TEXT NOT NULL, periodo TEXT NOT NULL, "
+                "comprobado REAL NOT NULL, PRIMARY KEY (tabla, idema, periodo)) WITHOUT ROWID"
+            )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.cerrar()
+
+    @staticmethod
+    def _validar_tabla(tabla: str) -> None:
+        if tabla not in TABLAS:
+            raise ValueError(f"Tabla '{tabla}' no válida. Tablas válidas: {', '.join(TABLAS)}")
+
+    def guardar(self, tabla: str, registros: Iterable[dict], periodo: str | None = None) -> int:
+        """Añade registros para insertar o actualizar por (estación, periodo).
+
+        Args:
+            tabla: 'diarios', 'mensuales', 'normales' o 'extremos'.
+            registros: Registros de AEMET (con clave 'indicativo').
+            periodo: Periodo de todos los registros; obligatorio en 'extremos'
+                (el parámetro), en el resto se toma de cada registro.
+
+        Returns:
+            int: Registros aceptados (los que no tienen estación o periodo se ignoran).
+        """
+        self._validar_tabla(tabla)
+        campo = TABLAS[tabla]
+        pendientes = self._pendientes[tabla]
+        aceptados = 0
+        for registro in registros:
+            idema = registro.get("indicativo")
+            valor = periodo if campo is None else registro.get(campo)
+            if not idema or valor is None:
+                continue
+            pendientes.append((idema, _periodo(tabla, valor), json.dumps(registro, ensure_ascii=False)))
+            aceptados += 1
+        if len(pendientes) >= self.tamano_lote:
+            self.confirmar()
+        return aceptados
+
+    def confirmar(self) -> None:
+        """Escribe en una transacción todos los registros pendientes."""
+        with self._conexion:
+            for tabla, pendientes in self._pendientes.items():
+                if pendientes:
+                    self._conexion.executemany(
+                        f"INSERT INTO {tabla} (idema, periodo, datos) VALUES (?, ?, ?) "
+                        "ON CONFLICT (idema, periodo) DO UPDATE SET datos = excluded.datos",
+                        pendientes,
+                    )
+                    pendientes.clear()
+
+    def consultar(
+        self,
+        tabla: str,
+        idema: str,
+        periodo_inicio: str | None = None,
+        periodo_fin: str | None = None,
+    ) -> list[dict]:
+        """Registros de una estación, opcionalmente en un rango de periodos (incluido).
+
+        Los periodos son fechas 'AAAA-MM-DD' en 'diarios', 'AAAA-MM' en
+        'mensuales' (el mes 13 es el resumen anual), el mes en 'normales' y el
+        parámetro en 'extremos'.
+        """
+        self._validar_tabla(tabla)
+        self.confirmar()
+        consulta = f"SELECT datos FROM {tabla} WHERE idema = ?"
+        argumentos = [idema]
+        if periodo_inicio is not None:
+            consulta += " AND periodo >= ?"
+            argumentos.append(periodo_inicio)
+        if periodo_fin is not None:
+            consulta += " AND periodo <= ?"
+            argumentos.append(periodo_fin)
+        consulta += " ORDER BY periodo"
+        return [json.loads(fila[0]) for fila in self._conexion.execute(consulta, argumentos)]
+
+    def obtener(self, tabla: str, idema: str, periodo: str) -> dict | None:
+        """Registro de una estación y periodo, o None si no está."""
+        self._validar_tabla(tabla)
+        self.confirmar()
+        fila = self._conexion.execute(
+            f"SELECT datos FROM {tabla} WHERE idema = ? AND periodo = ?",
+            (idema, _periodo(tabla, periodo)),
+        ).fetchone()
+        return json.loads(fila[0]) if fila else None
+
+    def confirmar_huecos(self, tabla: str, idema: str, periodos: Iterable[str]) -> None:
+        """Registra periodos que AEMET ha confirmado sin datos para una estación.
+
+        Los periodos usan el mismo formato que :meth:`consultar` ('AAAA-MM-DD'
+        en 'diarios', el año 'AAAA' en 'mensuales').
+        """
+        self._validar_tabla(tabla)
+        ahora = time.time()
+        with self._conexion:
+            self._conexion.executemany(
+                "INSERT INTO huecos_confirmados (tabla, idema, periodo, comprobado) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (tabla, idema, periodo) DO UPDATE SET comprobado = excluded.comprobado",
+                [(tabla, idema, str(periodo), ahora) for periodo in periodos],
+            )
+
+    def huecos_confirmados(
+        self,
+        tabla: str,
+        idema: str,
+        periodo_inicio: str | None = None,
+        periodo_fin: str | None = None,
+        ttl: float | None = None,
+    ) -> set[str]:
+        """Periodos confirmados sin datos en un rango (incluido).
+
+        Args:
+            tabla: Tabla a la que se refieren los periodos.
+            idema: Identificador de estación.
+            periodo_inicio: Primer periodo del rango.
+            periodo_fin: Último periodo del rango.
+            ttl: Antigüedad máxima (s) de la comprobación; las más antiguas se
+                ignoran y el periodo se vuelve a pedir. None para no caducar.
+        """
+        self._validar_tabla(tabla)
+        consulta = "SELECT periodo FROM huecos_confirmados WHERE tabla = ? AND idema = ?"
+        argumentos: list = [tabla, idema]
+        if periodo_inicio is not None:
+            consulta += " AND periodo >= ?"
+            argumentos.append(periodo_inicio)
+        if periodo_fin is not None:
+            consulta += " AND periodo <= ?"
+            argumentos.append(periodo_fin)
+        if ttl is not None:
+            consulta += " AND comprobado >= ?"
+            argumentos.append(time.time() - ttl)
+        return {fila[0] for fila in self._conexion.execute(consulta, argumentos)}
+
+    def cerrar(self) -> None:
+        """Escribe lo pendiente y cierra la conexión."""
+        self.confirmar()
+        self._conexion.close()
@@ -0,0 +1,147 @@
+"""Caché en memoria para consultas repetidas.
+
+Pensada para servicios de larga duración que repiten las mismas consultas
+de estación y periodo: los resultados ya decodificados se guardan como
+``ResultadosCompactos`` congelados, con expulsión LRU por tamaño en bytes y
+caducidad (TTL). Una consulta repetida se resuelve sin disco ni red.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable, Iterable
+
+from .resultados import ResultadosCompactos
+
+
+class CacheMemoria:
+    """Caché LRU acotada por bytes, con TTL y estadísticas de aciertos.
+
+    Las entradas se guardan congeladas (ver
+    :meth:`ResultadosCompactos.congelar`): nadie puede modificar una entrada
+    compartida, y cada fila leída es un dict nuevo. Es segura entre hilos.
+
+    Args:
+        max_bytes: Tamaño máximo aproximado de todas las entradas, en bytes.
+        ttl: Segundos de validez de cada entrada (None para no caducar).
+
+    Example:
+        >>> cache = CacheMemoria(max_bytes=128 * 1024**2, ttl=3600)
+        >>> await datos_diarios("3195", "2015-01-01", "2015-12-31", [API_KEY], cache=cache)
+        >>> cache.estadisticas()
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, ttl: float | None = 3600):
+        if max_bytes <= 0:
+            raise ValueError("'max_bytes' debe ser mayor que 0.")
+        if ttl is not None and ttl <= 0:
+            raise ValueError("'ttl' debe ser mayor que 0 o None.")
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # clave -> (resultados, bytes, instante de caducidad)
+        self._entradas: OrderedDict[Hashable, tuple[ResultadosCompactos, int, float | None]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.expiradas = 0
+        self.expulsadas = 0
+
+    def __len__(self) -> int:
+        return len(self._entradas)
+
+    def __contains__(self, clave: Hashable) -> bool:
+        return self.obtener(clave, contar=False) is not None
+
+    def _quitar(self, clave: Hashable) -> None:
+        _, tamano, _ = self._entradas.pop(clave)
+        self._bytes -= tamano
+
+    def obtener(self, clave: Hashable, contar: bool = True) -> ResultadosCompactos | None:
+        """Entrada de ``clave``, o None si no está o ha caducado.
+
+        Args:
+            clave: Clave de la consulta.
+            contar: Si es False, no altera las estadísticas ni el orden LRU.
+        """
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None and entrada[2] is not None and entrada[2] <= time.monotonic():
+                self._quitar(clave)
+                self.expiradas += 1
+                entrada = None
+            if not contar:
+                return entrada[0] if entrada is not None else None
+            if entrada is None:
+                self.fallos += 1
+                return None
+            self._entradas.move_to_end(clave)
+            self.aciertos += 1
+            return entrada[0]
+
+    def guardar(
+        self,
+        clave: Hashable,
+        registros: Iterable[dict],
+        ttl: float | None = None,
+    ) -> ResultadosCompactos:
+        """Guarda los registros de una consulta y devuelve la entrada congelada.
+
+        Si los registros ya son un ``ResultadosCompactos`` se congela ese mismo
+        objeto, sin copiarlo. Una entrada mayor que ``max_bytes`` no se guarda.
+
+        Args:
+            clave: Clave de la consulta.
+            registros: Registros de la respuesta.
+            ttl: Validez (s) de esta entrada; por defecto, la de la caché.
+        """
+        if isinstance(registros, ResultadosCompactos):
+            resultados = registros.congelar()
+        else:
+            resultados = ResultadosCompactos(registros).congelar()
+        tamano = resultados.tamano_bytes()
+        ttl = self.ttl if ttl is None else ttl
+        caducidad = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            if clave in self._entradas:
+                self._quitar(clave)
+            if tamano > self.max_bytes:
+                return resultados
+            self._entradas[clave] = (resultados, tamano, caducidad)
+            self._bytes += tamano
+            while self._bytes > self.max_bytes:
+                clave_antigua = next(iter(self._entradas))
+                self._quitar(clave_antigua)
+                self.expulsadas += 1
+        return resultados
+
+    def invalidar(self, clave: Hashable) -> bool:
+        """Elimina una entrada. Devuelve True si existía."""
+        with self._lock:
+            if clave not in self._entradas:
+                return False
+            self._quitar(clave)
+            return True
+
+    def limpiar(self) -> None:
+        """Vacía la caché (las estadísticas se conservan)."""
+        with self._lock:
+            self._entradas.clear()
+            self._bytes = 0
+
+    def estadisticas(self) -> dict:
+        """Entradas, bytes ocupados, aciertos, fallos, tasa de aciertos, expiradas y expulsadas."""
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                "entradas": len(self._entradas),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "tasa_aciertos": self.aciertos / consultas if consultas else 0.0,
+                "expiradas": self.expiradas,
+                "expulsadas": self.expulsadas,
+            }
@@ -0,0 +1,154 @@
+"""Peticiones de metadatos con cobertura (hedging) entre claves API.
+
+El endpoint de metadatos de AEMET suele responder en unos cientos de
+milisegundos, pero algunas peticiones se quedan colgadas hasta el timeout.
+Con cobertura, si una petición no ha respondido en el percentil configurado
+de las latencias observadas, se lanza un duplicado con otra clave y se usa
+la primera respuesta, cancelando la otra.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+
+from .perfilado import anotar_peticion, medir
+from .suport_functions import AemetError, _decodificar_json
+
+
+class Cobertura:
+    """Configuración y estadísticas de latencia para peticiones con cobertura.
+
+    Conviene compartir una misma instancia entre llamadas para que el
+    retardo se ajuste a las latencias reales.
+
+    Args:
+        percentil: Percentil de latencia tras el cual se lanza el duplicado.
+        retardo_inicial: Retardo (s) mientras no hay suficientes muestras.
+        retardo_minimo: Retardo mínimo (s), para no duplicar siempre.
+        retardo_maximo: Retardo máximo (s).
+        ventana: Número de latencias recientes que se tienen en cuenta.
+        timeout: Timeout (s) de cada intento individual.
+    """
+
+    def __init__(
+        self,
+        percentil: float = 0.95,
+        retardo_inicial: float = 1.0,
+        retardo_minimo: float = 0.2,
+        retardo_maximo: float = 5.0,
+        ventana: int = 200,
+        timeout: float = 10,
+    ):
+        if not 0 < percentil < 1:
+            raise ValueError("'percentil' debe estar entre 0 y 1.")
+        self.percentil = percentil
+        self.retardo_inicial = retardo_inicial
+        self.retardo_minimo = retardo_minimo
+        self.retardo_maximo = retardo_maximo
+        self.timeout = timeout
+        self._latencias: deque[float] = deque(maxlen=ventana)
+        self._siguiente_clave = 0
+        self.peticiones = 0
+        self.duplicadas = 0
+        self.ganadas_por_duplicado = 0
+
+    def registrar(self, latencia: float) -> None:
+        """Añade la latencia (s) de una petición completada."""
+        self._latencias.append(latencia)
+
+    def retardo(self) -> float:
+        """Segundos a esperar antes de lanzar el duplicado."""
+        if len(self._latencias) < 10:
+            return self.retardo_inicial
+        ordenadas = sorted(self._latencias)
+        valor = ordenadas[min(len(ordenadas) - 1, int(self.percentil * len(ordenadas)))]
+        return min(self.retardo_maximo, max(self.retardo_minimo, valor))
+
+    def claves(self, num_claves: int) -> tuple[int, int]:
+        """Índices de clave para el intento principal y el duplicado (rotando)."""
+        principal = self._siguiente_clave % num_claves
+        self._siguiente_clave += 1
+        return principal, (principal + 1) % num_claves
+
+
+async def _intento_metadatos(url_template: str, api_key: str, timeout: float):
+    """Una única petición de metadatos con una clave, sin reintentos."""
+    import httpx
+
+    endpoint = url_template.replace("{apiKey}", api_key)
+    async with httpx.AsyncClient() as client:
+        resp = await client.get(endpoint, timeout=timeout)
+        anotar_peticion(bytes_metadatos=len(resp.content))
+        resp.raise_for_status()
+        if "application/json" not in resp.headers.get("Content-Type", ""):
+            raise AemetError(f"Respuesta inesperada (no JSON): {resp.text[:200]}")
+        return _decodificar_json(resp)
+
+
+async def fetch_con_cobertura(
+    url_template: str,
+    tipo: str,
+    api_keys: list[str],
+    cobertura: Cobertura,
+    limitador=None,
+):
+    """Petición de metadatos con duplicado ante respuestas lentas.
+
+    Lanza la petición con una clave y, si no ha terminado tras
+    ``cobertura.retardo()``, lanza otra con la clave siguiente. Devuelve la
+    primera respuesta correcta y cancela la otra. Si ambas fallan, o si solo
+    hay una clave (el duplicado competiría por la misma cuota), recurre a
+    :func:`fetch_con_reintentos_endpoint_aemet`.
+
+    Args:
+        url_template: URL del endpoint con el marcador ``{apiKey}``.
+        tipo: Etiqueta de la consulta para los mensajes.
+        api_keys: Claves API de AEMET.
+        cobertura: Configuración y estadísticas compartidas.
+        limitador: Limitador de cuota por clave opcional.
+    """
+    from .suport_functions import fetch_con_reintentos_endpoint_aemet
+
+    if len(api_keys) < 2:
+        return await fetch_con_reintentos_endpoint_aemet(
+            url_template, tipo=tipo, api_keys=api_keys, limitador=limitador
+        )
+
+    principal, secundaria = cobertura.claves(len(api_keys))
+    cobertura.peticiones += 1
+
+    async def intento(indice_clave):
+        if limitador is not None:
+            with medir("cuota"):
+                await limitador.adquirir(indice_clave)
+        inicio = time.perf_counter()
+        datos = await _intento_metadatos(url_template, api_keys[indice_clave], cobertura.timeout)
+        return datos, time.perf_counter() - inicio
+
+    primera = asyncio.create_task(intento(principal))
+    tareas = {primera}
+    try:
+        hechas, _ = await asyncio.wait(tareas, timeout=cobertura.retardo())
+        if not hechas:
+            print(f"⏱️ Sin respuesta en {cobertura.retardo():.2f}s ({tipo}); duplicando con la clave {secundaria + 1}")
+            cobertura.duplicadas += 1
+            tareas.add(asyncio.create_task(intento(secundaria)))
+        while tareas:
+            hechas, tareas = await asyncio.wait(tareas, return_when=asyncio.FIRST_COMPLETED)
+            for tarea in hechas:
+                if tarea.exception() is None:
+                    datos, latencia = tarea.result()
+                    cobertura.registrar(latencia)
+                    if tarea is not primera:
+                        cobertura.ganadas_por_duplicado += 1
+                    return datos
+                print(f"❗ Intento con cobertura fallido ({tipo}): {tarea.exception()}")
+    finally:
+        for tarea in tareas:
+            tarea.cancel()
+
+    return await fetch_con_reintentos_endpoint_aemet(
+        url_template, tipo=tipo, api_keys=api_keys, limitador=limitador
+    )
@@ -0,0 +1,205 @@
+"""Descarga repartida entre varios procesos con cuota de claves compartida.
+
+En cargas históricas muy grandes un único bucle de eventos acaba limitado
+por CPU (decodificación de JSON). Aquí las unidades de trabajo se reparten
+entre procesos, cada uno con su propio pipeline asíncrono, y el ritmo de
+peticiones de cada clave se coordina en memoria compartida para que N
+procesos juntos nunca superen la cuota de ninguna clave.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, Iterable
+
+from .pipeline import Unidad, iterar_pipeline
+
+
+# Peticiones por minuto y clave que admite AEMET OpenData.
+PETICIONES_POR_MINUTO_AEMET = 50
+
+
+class CuotaCompartida:
+    """Limitador de peticiones por clave válido entre procesos.
+
+    Guarda en memoria compartida, para cada clave, el instante a partir del
+    cual puede hacerse la siguiente petición. Cada reserva avanza ese
+    instante en ``60 / peticiones_por_minuto`` segundos bajo un lock, así que
+    las peticiones de todos los procesos quedan espaciadas.
+
+    Args:
+        num_claves: Número de claves API.
+        peticiones_por_minuto: Peticiones por minuto permitidas por clave.
+    """
+
+    def __init__(self, num_claves: int, peticiones_por_minuto: float = PETICIONES_POR_MINUTO_AEMET):
+        if peticiones_por_minuto <= 0:
+            raise ValueError("'peticiones_por_minuto' debe ser positivo.")
+        self.intervalo = 60.0 / peticiones_por_minuto
+        self._lock = multiprocessing.Lock()
+        self._siguiente = multiprocessing.RawArray("d", num_claves)
+
+    def reservar(self, indice_clave: int) -> float:
+        """Reserva un hueco para la clave y devuelve los segundos a esperar."""
+        with self._lock:
+            ahora = time.time()
+            turno = max(ahora, self._siguiente[indice_clave])
+            self._siguiente[indice_clave] = turno + self.intervalo
+        return turno - ahora
+
+    def reservar_cualquiera(self) -> tuple[int, float]:
+        """Reserva el hueco libre más próximo entre todas las claves.
+
+        Returns:
+            tuple: ``(indice_clave, segundos_a_esperar)``.
+        """
+        with self._lock:
+            ahora = time.time()
+            indice_clave = min(range(len(self._siguiente)), key=self._siguiente.__getitem__)
+            turno = max(ahora, self._siguiente[indice_clave])
+            self._siguiente[indice_clave] = turno + self.intervalo
+        return indice_clave, turno - ahora
+
+    async def adquirir(self, indice_clave: int) -> None:
+        """Espera hasta que la clave tenga cuota disponible."""
+        espera = self.reservar(indice_clave)
+        if espera > 0:
+            await asyncio.sleep(espera)
+
+    async def adquirir_cualquiera(self) -> int:
+        """Espera al primer hueco libre de cualquier clave y devuelve su índice."""
+        indice_clave, espera = self.reservar_cualquiera()
+        if espera > 0:
+            await asyncio.sleep(espera)
+        return indice_clave
+
+
+_cuota_proceso: CuotaCompartida | None = None
+
+
+def _inicializar_proceso(cuota: CuotaCompartida) -> None:
+    global _cuota_proceso
+    _cuota_proceso = cuota
+
+
+def _escribir_registros(f, datos) -> int:
+    if isinstance(datos, dict):
+        datos = [datos]
+    elif not isinstance(datos, list):
+        datos = [{"contenido": str(datos)}]
+    for registro in datos:
+        f.write(json.dumps(registro, ensure_ascii=False).encode("utf-8"))
+        f.write(b"\n")
+    return len(datos)
+
+
+async def _procesar_lote_async(lote, api_keys, ruta, workers_metadatos, workers_descargas):
+    recibidas = set()
+    registros = 0
+    with open(ruta, "wb") as f:
+        async for indice, datos in iterar_pipeline(
+            lote,
+            api_keys,
+            workers_metadatos=workers_metadatos,
+            workers_descargas=workers_descargas,
+            omitir_errores=True,
+            limitador=_cuota_proceso,
+        ):
+            recibidas.add(indice)
+            registros += _escribir_registros(f, datos)
+    fallidas = [lote[i][1] for i in range(len(lote)) if i not in recibidas]
+    return registros, fallidas
+
+
+def _procesar_lote(lote, api_keys, ruta, workers_metadatos, workers_descargas):
+    return asyncio.run(
+        _procesar_lote_async(lote, api_keys, ruta, workers_metadatos, workers_descargas)
+    )
+
+
+def descargar_multiproceso(
+    unidades: Iterable[Unidad],
+    api_keys: Iterable[str],
+    salida: str | BinaryIO,
+    procesos: int | None = None,
+    peticiones_por_minuto: float = PETICIONES_POR_MINUTO_AEMET,
+    workers_metadatos: int = 1,
+    workers_descargas: int = 2,
+) -> dict:
+    """Descarga las unidades repartidas entre varios procesos.
+
+    Cada proceso ejecuta su propio pipeline asíncrono sobre una parte de las
+    unidades y escribe los registros en NDJSON en un fichero temporal; al
+    terminar, los ficheros se concatenan en ``salida``. Las unidades que
+    fallan se omiten y se devuelven en el resumen.
+
+    Args:
+        unidades: Unidades ``(url_template, tipo, descripcion)``.
+        api_keys: Iterable con las claves API de AEMET.
+        salida: Ruta del fichero NDJSON de salida o fichero binario abierto.
+        procesos: Número de procesos (por defecto, el número de CPUs).
+        peticiones_por_minuto: Cuota por clave, común a todos los procesos.
+        workers_metadatos: Workers de metadatos por proceso.
+        workers_descargas: Workers de descarga por proceso.
+
+    Returns:
+        dict: ``{"registros": int, "fallidas": [tipo, ...]}``.
+    """
+    unidades = list(unidades)
+    api_keys_list = list(api_keys)
+    if not api_keys_list:
+        raise ValueError("Se requiere al menos una API key en 'api_keys'.")
+    if procesos is None:
+        procesos = os.cpu_count() or 1
+    procesos = max(1, min(procesos, len(unidades)))
+
+    # Reparto intercalado: las unidades contiguas (misma estación) acaban en
+    # procesos distintos y la carga queda equilibrada.
+    lotes = [unidades[i::procesos] for i in range(procesos)]
+    cuota = CuotaCompartida(len(api_keys_list), peticiones_por_minuto)
+    directorio = tempfile.mkdtemp(prefix="aemetdata_")
+    rutas = [os.path.join(directorio, f"parte_{i}.ndjson") for i in range(procesos)]
+
+    print(f"🚀 Repartiendo {len(unidades)} consultas entre {procesos} procesos")
+    registros = 0
+    fallidas = []
+    try:
+        with ProcessPoolExecutor(
+            max_workers=procesos,
+            initializer=_inicializar_proceso,
+            initargs=(cuota,),
+        ) as executor:
+            futuros = [
+                executor.submit(
+                    _procesar_lote, lote, api_keys_list, ruta, workers_metadatos, workers_descargas
+                )
+                for lote, ruta in zip(lotes, rutas)
+            ]
+            for futuro in futuros:
+                registros_lote, fallidas_lote = futuro.result()
+                registros += registros_lote
+                fallidas.extend(fallidas_lote)
+
+        if isinstance(salida, str):
+            with open(salida, "wb") as destino:
+                _concatenar(rutas, destino)
+        else:
+            _concatenar(rutas, salida)
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    print(f"✅ {registros} registros descargados ({len(fallidas)} consultas fallidas)")
+    return {"registros": registros, "fallidas": fallidas}
+
+
+def _concatenar(rutas, destino) -> None:
+    for ruta in rutas:
+        with open(ruta, "rb") as origen:
+            shutil.copyfileobj(origen, destino)
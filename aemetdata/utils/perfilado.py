@@ -0,0 +1,229 @@
+"""Perfilado opcional de las consultas a AEMET.
+
+Dentro de un bloque ``with perfilar()``, el pipeline y las funciones de
+descarga anotan para cada unidad de trabajo el tiempo de cada etapa
+(metadatos, descarga, decodificación JSON, esperas de cuota y entre reintentos
+y fusión de resultados), los bytes recibidos y el número de peticiones. Al
+salir se obtiene un resumen para dimensionar workers y claves con datos.
+
+Fuera de ``perfilar()`` las anotaciones no hacen nada, así que el coste sin
+perfilado es una consulta a un ``ContextVar``.
+"""
+
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+# Etapas en orden del flujo. 'cuota' (esperas del limitador) y 'espera'
+# (pausas entre reintentos) se miden dentro de 'metadatos', y
+# 'decodificacion' dentro de 'descarga'; el resumen las descuenta.
+ETAPAS = ("metadatos", "cuota", "espera", "descarga", "decodificacion", "fusion")
+
+SIN_UNIDAD = "(sin unidad)"
+
+_perfil_activo: ContextVar["Perfil | None"] = ContextVar("aemetdata_perfil", default=None)
+_unidad_activa: ContextVar["str | None"] = ContextVar("aemetdata_unidad", default=None)
+
+
+class Perfil:
+    """Tiempos, bytes y peticiones por unidad de trabajo.
+
+    Se obtiene con :func:`perfilar`. Los tiempos de cada etapa son la suma
+    entre todos los workers, así que con concurrencia pueden superar la
+    duración real; ``duracion`` es el tiempo de reloj del bloque.
+    """
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.fin: float | None = None
+        self.unidades: dict[str, dict] = {}
+
+    def _registro(self, unidad: str | None) -> dict:
+        unidad = unidad or _unidad_activa.get() or SIN_UNIDAD
+        registro = self.unidades.get(unidad)
+        if registro is None:
+            registro = {etapa: 0.0 for etapa in ETAPAS}
+            registro.update(peticiones=0, bytes_metadatos=0, bytes_datos=0, error=None)
+            self.unidades[unidad] = registro
+        return registro
+
+    def anotar_tiempo(self, etapa: str, segundos: float, unidad: str | None = None) -> None:
+        self._registro(unidad)[etapa] += segundos
+
+    def anotar_peticion(self, bytes_metadatos: int = 0, bytes_datos: int = 0, unidad: str | None = None) -> None:
+        registro = self._registro(unidad)
+        registro["peticiones"] += 1
+        registro["bytes_metadatos"] += bytes_metadatos
+        registro["bytes_datos"] += bytes_datos
+
+    def anotar_error(self, error: BaseException, unidad: str | None = None) -> None:
+        self._registro(unidad)["error"] = f"{type(error).__name__}: {error}"
+
+    @property
+    def duracion(self) -> float:
+        return (self.fin if self.fin is not None else time.perf_counter()) - self.inicio
+
+    @staticmethod
+    def _exclusivos(registro: dict) -> dict:
+        """Tiempos por etapa sin solapes: red de metadatos sin esperas, etc."""
+        return {
+            "metadatos": max(0.0, registro["metadatos"] - registro["cuota"] - registro["espera"]),
+            "cuota": registro["cuota"],
+            "espera": registro["espera"],
+            "descarga": max(0.0, registro["descarga"] - registro["decodificacion"]),
+            "decodificacion": registro["decodificacion"],
+            "fusion": registro["fusion"],
+        }
+
+    def resumen(self, mas_lentas: int = 10) -> dict:
+        """Resumen del perfil.
+
+        Args:
+            mas_lentas: Número de unidades más lentas a incluir.
+
+        Returns:
+            dict: 'duracion' (s de reloj), 'unidades', 'fallidas', 'peticiones',
+                  'peticiones_por_segundo', 'bytes_metadatos', 'bytes_datos',
+                  'etapas' (``{etapa: {"segundos", "porcentaje"}}``, tiempo
+                  acumulado entre workers), 'cuota' (s esperando cuota del
+                  limitador), 'espera' (s dormidos entre reintentos) y
+                  'mas_lentas' (lista de dicts con 'unidad',
+                  'total', los tiempos por etapa, 'bytes_datos' y 'error').
+        """
+        duracion = self.duracion
+        totales = {etapa: 0.0 for etapa in ETAPAS}
+        filas = []
+        for unidad, registro in self.unidades.items():
+            exclusivos = self._exclusivos(registro)
+            for etapa, segundos in exclusivos.items():
+                totales[etapa] += segundos
+            if unidad != SIN_UNIDAD:
+                filas.append({
+                    "unidad": unidad,
+                    "total": sum(exclusivos.values()),
+                    **exclusivos,
+                    "bytes_datos": registro["bytes_datos"],
+                    "error": registro["error"],
+                })
+        acumulado = sum(totales.values())
+        peticiones = sum(registro["peticiones"] for registro in self.unidades.values())
+        filas.sort(key=lambda fila: fila["total"], reverse=True)
+        return {
+            "duracion": duracion,
+            "unidades": len(filas),
+            "fallidas": sum(1 for fila in filas if fila["error"]),
+            "peticiones": peticiones,
+            "peticiones_por_segundo": peticiones / duracion if duracion > 0 else 0.0,
+            "bytes_metadatos": sum(r["bytes_metadatos"] for r in self.unidades.values()),
+            "bytes_datos": sum(r["bytes_datos"] for r in self.unidades.values()),
+            "etapas": {
+                etapa: {
+                    "segundos": segundos,
+                    "porcentaje": 100 * segundos / acumulado if acumulado else 0.0,
+                }
+                for etapa, segundos in totales.items()
+            },
+            "cuota": totales["cuota"],
+            "espera": totales["espera"],
+            "mas_lentas": filas[:mas_lentas],
+        }
+
+    def informe(self, mas_lentas: int = 10) -> str:
+        """Resumen en texto, listo para imprimir."""
+        resumen = self.resumen(mas_lentas)
+        lineas = [
+            f"📊 Perfil: {resumen['unidades']} unidades ({resumen['fallidas']} fallidas) "
+            f"en {resumen['duracion']:.2f}s",
+            f"   {resumen['peticiones']} peticiones ({resumen['peticiones_por_segundo']:.2f}/s), "
+            f"{resumen['bytes_datos'] / 1024:.1f} KiB de datos, "
+            f"{resumen['bytes_metadatos'] / 1024:.1f} KiB de metadatos",
+            f"   Tiempo esperando cuota: {resumen['cuota']:.2f}s",
+            f"   Tiempo dormido en reintentos: {resumen['espera']:.2f}s",
+            "   Tiempo acumulado por etapa:",
+        ]
+        for etapa, valores in resumen["etapas"].items():
+            lineas.append(f"     {etapa:<15}{valores['segundos']:>10.3f}s {valores['porcentaje']:>6.1f}%")
+        if resumen["mas_lentas"]:
+            lineas.append("   Unidades más lentas:")
+            for fila in resumen["mas_lentas"]:
+                detalle = ", ".join(
+                    f"{etapa} {fila[etapa]:.3f}s" for etapa in ETAPAS if fila[etapa] > 0
+                )
+                error = f" ❗ {fila['error']}" if fila["error"] else ""
+                lineas.append(f"     {fila['total']:.3f}s  {fila['unidad']} ({detalle}){error}")
+        return "\n".join(lineas)
+
+
+@contextmanager
+def perfilar(mostrar: bool = True):
+    """Activa el perfilado para las consultas hechas dentro del bloque.
+
+    Args:
+        mostrar: Si es True, imprime el informe al salir del bloque.
+
+    Yields:
+        Perfil: Perfil con los datos recogidos (``resumen()``, ``informe()``).
+
+    Example:
+        >>> with perfilar() as perfil:
+        ...     await datos_diarios("3195", "2000-01-01", "2020-12-31", CLAVES, workers_descargas=4)
+        >>> perfil.resumen()["espera"]
+    """
+    perfil = Perfil()
+    token = _perfil_activo.set(perfil)
+    try:
+        yield perfil
+    finally:
+        _perfil_activo.reset(token)
+        perfil.fin = time.perf_counter()
+        if mostrar:
+            print(perfil.informe())
+
+
+def perfil_activo() -> Perfil | None:
+    """Perfil en curso, o None si no se está perfilando."""
+    return _perfil_activo.get()
+
+
+@contextmanager
+def en_unidad(nombre: str):
+    """Atribuye a la unidad ``nombre`` lo que se anote dentro del bloque."""
+    if _perfil_activo.get() is None:
+        yield
+        return
+    token = _unidad_activa.set(nombre)
+    try:
+        yield
+    finally:
+        _unidad_activa.reset(token)
+
+
+@contextmanager
+def medir(etapa: str, unidad: str | None = None):
+    """Suma al perfil activo el tiempo del bloque en la etapa indicada."""
+    perfil = _perfil_activo.get()
+    if perfil is None:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        perfil.anotar_tiempo(etapa, time.perf_counter() - inicio, unidad)
+
+
+def anotar_peticion(bytes_metadatos: int = 0, bytes_datos: int = 0) -> None:
+    """Cuenta una petición HTTP (y sus bytes) en la unidad activa."""
+    perfil = _perfil_activo.get()
+    if perfil is not None:
+        perfil.anotar_peticion(bytes_metadatos, bytes_datos)
+
+
+def anotar_error(error: BaseException, unidad: str) -> None:
+    """Marca la unidad como fallida en el perfil activo."""
+    perfil = _perfil_activo.get()
+    if perfil is not None:
+        perfil.anotar_error(error, unidad)
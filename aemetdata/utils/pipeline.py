@@ -0,0 +1,185 @@
+"""Descarga en dos etapas solapadas para consultas de AEMET.
+
+Toda consulta a AEMET son dos saltos: la llamada de metadatos, que devuelve
+la URL de ``datos``, y la descarga de esa URL. Aquí cada salto tiene su
+propio grupo de workers, unidos por colas acotadas, de modo que mientras se
+descargan unas unidades ya se están resolviendo los metadatos de las
+siguientes. Los metadatos consumen cuota de las claves y las descargas
+ancho de banda, así que cada grupo se dimensiona por separado.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Awaitable, Callable, Iterable
+
+from .perfilado import anotar_error, en_unidad, medir
+from .suport_functions import AemetError, fetch_json_url, obtener_url_datos
+
+
+# Una unidad de trabajo: (url_template con {apiKey}, tipo, descripción).
+Unidad = tuple[str, str, str]
+
+
+async def _con_plazo(corrutina, limite: float | None, tipo: str):
+    """Espera la corrutina hasta el instante ``limite`` del bucle (None: sin límite)."""
+    if limite is None:
+        return await corrutina
+    restante = limite - asyncio.get_running_loop().time()
+    try:
+        return await asyncio.wait_for(corrutina, max(restante, 0))
+    except asyncio.TimeoutError:
+        raise AemetError(f"Plazo agotado para la consulta {tipo}")
+
+
+async def iterar_pipeline(
+    unidades: Iterable[Unidad],
+    api_keys: list[str],
+    descargar: Callable[[str], Awaitable] | None = None,
+    workers_metadatos: int = 1,
+    workers_descargas: int = 1,
+    tamano_cola: int | None = None,
+    ordenado: bool = False,
+    omitir_errores: bool = False,
+    limitador=None,
+    cobertura=None,
+    plazo: float | None = None,
+    errores: dict | None = None,
+):
+    """Ejecuta las unidades en pipeline y va entregando sus datos.
+
+    Args:
+        unidades: Unidades ``(url_template, tipo, descripcion)``.
+        api_keys: Claves API de AEMET.
+        descargar: Corrutina que recibe la URL de ``datos`` y devuelve su
+            contenido (por defecto :func:`fetch_json_url`).
+        workers_metadatos: Workers que resuelven metadatos en paralelo.
+        workers_descargas: Workers que descargan ``datos`` en paralelo.
+        tamano_cola: Tamaño de las colas entre etapas (por defecto el doble
+            de ``workers_descargas``). Limita la memoria en vuelo.
+        ordenado: Si es True, entrega los resultados en el orden de las
+            unidades; si no, según van llegando. En modo ordenado una unidad
+            no empieza hasta estar a menos de ``tamano_cola`` posiciones de
+            la siguiente por entregar, así que una unidad lenta no acumula
+            resultados sin límite detrás de ella.
+        omitir_errores: Si es True, las unidades que fallan se avisan por
+            pantalla y se omiten; si no, el primer error se propaga.
+        limitador: Limitador de cuota por clave para las llamadas de
+            metadatos (ver :class:`aemetdata.utils.multiproceso.CuotaCompartida`).
+        cobertura: ``Cobertura`` opcional para duplicar con otra clave las
+            llamadas de metadatos lentas (ver :mod:`aemetdata.utils.cobertura`).
+        plazo: Segundos máximos por unidad, sumando metadatos y descarga. Una
+            unidad que lo agota falla con ``AemetError``.
+        errores: Dict opcional donde, con ``omitir_errores``, se anota
+            ``{indice: excepción}`` de cada unidad omitida.
+
+    Dentro de :func:`aemetdata.utils.perfilado.perfilar` se anotan los
+    tiempos de cada etapa por unidad (identificada por su ``tipo``).
+
+    Yields:
+        tuple: ``(indice, datos)`` con el índice de la unidad.
+
+    Raises:
+        ValueError: Si algún tamaño de grupo no es positivo.
+        AemetError: Si falla una unidad y ``omitir_errores`` es False.
+    """
+    if workers_metadatos < 1 or workers_descargas < 1:
+        raise ValueError("El número de workers de cada etapa debe ser al menos 1.")
+    if descargar is None:
+        descargar = fetch_json_url
+    if tamano_cola is None:
+        tamano_cola = 2 * workers_descargas
+
+    unidades = list(unidades)
+    bucle = asyncio.get_running_loop()
+    cola_unidades: asyncio.Queue = asyncio.Queue()
+    for indice, unidad in enumerate(unidades):
+        cola_unidades.put_nowait((indice, unidad))
+    cola_descargas: asyncio.Queue = asyncio.Queue(maxsize=tamano_cola)
+    cola_resultados: asyncio.Queue = asyncio.Queue(maxsize=tamano_cola)
+    # Siguiente índice por entregar en modo ordenado; 'avance' avisa cuando crece.
+    siguiente = 0
+    avance = asyncio.Condition()
+
+    async def resolver_metadatos():
+        while True:
+            try:
+                indice, (url_template, tipo, descripcion) = cola_unidades.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            if ordenado:
+                # Las unidades salen de la cola en orden, así que la unidad
+                # 'siguiente' siempre entra en la ventana y no hay bloqueo.
+                async with avance:
+                    await avance.wait_for(lambda: indice < siguiente + tamano_cola)
+            print(f"🔍 Solicitando {descripcion}")
+            limite = None if plazo is None else bucle.time() + plazo
+            try:
+                with en_unidad(tipo), medir("metadatos"):
+                    datos_url = await _con_plazo(
+                        obtener_url_datos(
+                            url_template, tipo, api_keys, limitador=limitador, cobertura=cobertura
+                        ),
+                        limite,
+                        tipo,
+                    )
+            except Exception as exc:
+                anotar_error(exc, tipo)
+                await cola_resultados.put((indice, None, exc))
+                continue
+            await cola_descargas.put((indice, datos_url, limite))
+
+    async def descargar_datos():
+        while True:
+            elemento = await cola_descargas.get()
+            if elemento is None:
+                return
+            indice, datos_url, limite = elemento
+            tipo = unidades[indice][1]
+            print(f"✨ Descargando datos desde URL de AEMET: {datos_url}")
+            try:
+                with en_unidad(tipo), medir("descarga"):
+                    datos = await _con_plazo(descargar(datos_url), limite, tipo)
+            except Exception as exc:
+                anotar_error(exc, tipo)
+                await cola_resultados.put((indice, None, exc))
+                continue
+            await cola_resultados.put((indice, datos, None))
+
+    resolutores = [asyncio.create_task(resolver_metadatos()) for _ in range(workers_metadatos)]
+    descargadores = [asyncio.create_task(descargar_datos()) for _ in range(workers_descargas)]
+
+    async def cerrar_descargas():
+        await asyncio.gather(*resolutores)
+        for _ in descargadores:
+            await cola_descargas.put(None)
+
+    cierre = asyncio.create_task(cerrar_descargas())
+    pendientes = {}
+    try:
+        for _ in range(len(unidades)):
+            indice, datos, error = await cola_resultados.get()
+            if error is not None:
+                if not omitir_errores:
+                    raise error
+                print(f"⚠️ Se omite la unidad {unidades[indice][1]}: {error}")
+                if errores is not None:
+                    errores[indice] = error
+            if not ordenado:
+                if error is None:
+                    yield indice, datos
+                continue
+            pendientes[indice] = (datos, error)
+            while siguiente in pendientes:
+                datos_listos, error_listo = pendientes.pop(siguiente)
+                siguiente += 1
+                async with avance:
+                    avance.notify_all()
+                if error_listo is None:
+                    yield siguiente - 1, datos_listos
+    finally:
+        tareas = [*resolutores, *descargadores, cierre]
+        for tarea in tareas:
+            tarea.cancel()
+        await asyncio.gather(*tareas, return_exceptions=True)
+
@@ -0,0 +1,175 @@
+"""Contenedor compacto para resultados de AEMET.
+
+Las funciones de climatología devuelven una lista con un dict por registro,
+lo que repite en cada fila las mismas claves y los mismos valores de
+estación. ``ResultadosCompactos`` guarda cada columna codificada por
+diccionario: los valores distintos se almacenan una sola vez y cada celda
+ocupa 4 bytes dentro de un ``array``.
+"""
+
+from __future__ import annotations
+
+import sys
+from array import array
+from collections.abc import Sequence
+from typing import Iterable
+
+
+# Código reservado para las celdas de filas que no tienen la columna.
+_AUSENTE = 0
+
+
+class ResultadosCompactos(Sequence):
+    """Secuencia de registros con almacenamiento columnar.
+
+    Se usa igual que la lista de dicts que devuelven las funciones de
+    ``aemetdata.climatologia``: admite ``len``, iteración, ``append``,
+    ``extend`` e indexado por posición, que devuelve un dict nuevo con la
+    fila. Indexar por nombre de columna devuelve la lista de valores de esa
+    columna (``None`` donde la fila no la tiene). Tras :meth:`congelar` el
+    contenedor es de solo lectura.
+
+    Example:
+        >>> resultado = ResultadosCompactos([{"indicativo": "3195", "tmax": "12,3"}])
+        >>> resultado[0]["tmax"]
+        '12,3'
+        >>> resultado["indicativo"]
+        ['3195']
+    """
+
+    __slots__ = ("_n", "_codigos", "_valores", "_indices", "_congelado")
+
+    def __init__(self, filas: Iterable[dict] | None = None):
+        self._n = 0
+        self._congelado = False
+        self._codigos: dict[str, array] = {}
+        self._valores: dict[str, list] = {}
+        self._indices: dict[str, dict] = {}
+        if filas is not None:
+            self.extend(filas)
+
+    def _nueva_columna(self, nombre: str) -> None:
+        self._codigos[nombre] = array("I", [_AUSENTE]) * self._n
+        self._valores[nombre] = [None]
+        self._indices[nombre] = {}
+
+    def _codificar(self, nombre: str, valor) -> int:
+        indice = self._indices[nombre]
+        # El tipo forma parte de la clave para no confundir 1, 1.0 y True.
+        clave = (type(valor), valor)
+        try:
+            codigo = indice.get(clave)
+        except TypeError:
+            # Valores no hashables (listas, dicts anidados): sin deduplicar.
+            self._valores[nombre].append(valor)
+            return len(self._valores[nombre]) - 1
+        if codigo is None:
+            if isinstance(valor, str):
+                valor = sys.intern(valor)
+            codigo = len(self._valores[nombre])
+            self._valores[nombre].append(valor)
+            indice[clave] = codigo
+        return codigo
+
+    def append(self, fila: dict) -> None:
+        """Añade un registro."""
+        if self._congelado:
+            raise TypeError("ResultadosCompactos congelado: no admite nuevos registros.")
+        for nombre in fila:
+            if nombre not in self._codigos:
+                self._nueva_columna(nombre)
+        for nombre, codigos in self._codigos.items():
+            if nombre in fila:
+                codigos.append(self._codificar(nombre, fila[nombre]))
+            else:
+                codigos.append(_AUSENTE)
+        self._n += 1
+
+    def extend(self, filas: Iterable[dict]) -> None:
+        """Añade varios registros."""
+        for fila in filas:
+            self.append(fila)
+
+    def congelar(self) -> "ResultadosCompactos":
+        """Marca el contenedor como de solo lectura y libera sus índices.
+
+        Las filas se devuelven siempre como dicts nuevos, así que un contenedor
+        congelado puede compartirse sin que nadie altere su contenido.
+
+        Returns:
+            ResultadosCompactos: El propio contenedor.
+        """
+        self._congelado = True
+        self._indices = {}
+        # array crece por bloques; copiarlo libera la capacidad sobrante.
+        self._codigos = {nombre: array("I", codigos) for nombre, codigos in self._codigos.items()}
+        return self
+
+    @property
+    def congelado(self) -> bool:
+        """True si el contenedor es de solo lectura."""
+        return self._congelado
+
+    def __len__(self) -> int:
+        return self._n
+
+    def _fila(self, posicion: int) -> dict:
+        fila = {}
+        for nombre, codigos in self._codigos.items():
+            codigo = codigos[posicion]
+            if codigo != _AUSENTE:
+                fila[nombre] = self._valores[nombre][codigo]
+        return fila
+
+    def __getitem__(self, clave):
+        if isinstance(clave, str):
+            return self.columna(clave)
+        if isinstance(clave, slice):
+            return [self._fila(i) for i in range(*clave.indices(self._n))]
+        if clave < 0:
+            clave += self._n
+        if not 0 <= clave < self._n:
+            raise IndexError("Índice fuera de rango.")
+        return self._fila(clave)
+
+    def __iter__(self):
+        columnas = [(nombre, codigos, self._valores[nombre]) for nombre, codigos in self._codigos.items()]
+        for posicion in range(self._n):
+            fila = {}
+            for nombre, codigos, valores in columnas:
+                codigo = codigos[posicion]
+                if codigo != _AUSENTE:
+                    fila[nombre] = valores[codigo]
+            yield fila
+
+    def __repr__(self) -> str:
+        return f"ResultadosCompactos(filas={self._n}, columnas={len(self._codigos)})"
+
+    @property
+    def columnas(self) -> list[str]:
+        """Nombres de columna en orden de aparición."""
+        return list(self._codigos)
+
+    def columna(self, nombre: str) -> list:
+        """Devuelve los valores de una columna (``None`` donde falta).
+
+        Raises:
+            KeyError: Si la columna no existe.
+        """
+        valores = self._valores[nombre]
+        return [valores[codigo] for codigo in self._codigos[nombre]]
+
+    def a_columnas(self) -> dict[str, list]:
+        """Devuelve ``{columna: valores}``, listo para ``pandas.DataFrame``."""
+        return {nombre: self.columna(nombre) for nombre in self._codigos}
+
+    def tamano_bytes(self) -> int:
+        """Estimación de la memoria ocupada por el contenedor, en bytes."""
+        total = sys.getsizeof(self)
+        for nombre, codigos in self._codigos.items():
+            valores = self._valores[nombre]
+            total += sys.getsizeof(codigos) + sys.getsizeof(valores)
+            if nombre in self._indices:
+                total += sys.getsizeof(self._indices[nombre])
+            total += sum(sys.getsizeof(valor) for valor in valores[1:])
+        return total
@@ -6,9 +6,10 @@ def get_relativedelta():
         raise ImportError("Falta el paquete 'python-dateutil'. Instálalo con 'pip install python-dateutil'.")
 import asyncio
 import io
+import json
 import tarfile
 
-import httpx
+from .perfilado import anotar_peticion, medir
 
 
 MAX_CICLOS = 3
@@ -19,6 +20,27 @@ class AemetError(Exception):
     pass
 
 
+class AemetSinDatos(AemetError):
+    """AEMET ha respondido que no hay datos para la consulta (estado 404).
+
+    Es una respuesta definitiva, no un fallo transitorio: repetir la
+    consulta devolverá lo mismo.
+    """
+    pass
+
+
+def _decodificar_json(resp):
+    """JSON de una respuesta httpx respetando el charset declarado.
+
+    ``Response.json()`` asume UTF-8, pero AEMET sirve algunos datos (las
+    predicciones, el maestro de municipios) en ISO-8859-15.
+    """
+    charset = resp.charset_encoding
+    if charset and charset.lower().replace("_", "-") not in ("utf-8", "utf8"):
+        return json.loads(resp.text)
+    return resp.json()
+
+
 async def fetch_json_url(url: str, descripcion: str | None = None):
     """Descarga un JSON desde una URL y lo devuelve como dict/list.
 
@@ -29,6 +51,8 @@ async def fetch_json_url(url: str, descripcion: str | None = None):
     Raises:
         AemetError: Si la descarga falla o el contenido no es JSON.
     """
+    import httpx
+
     contexto = f" ({descripcion})" if descripcion else ""
     print(f"📥 Descargando JSON{contexto} desde: {url}")
 
@@ -39,26 +63,114 @@ async def fetch_json_url(url: str, descripcion: str | None = None):
     except httpx.HTTPError as exc:
         raise AemetError(f"Error descargando JSON{contexto}: {exc}")
     
-    
-    return resp.json()
+    anotar_peticion(bytes_datos=len(resp.content))
+    with medir("decodificacion"):
+        return _decodificar_json(resp)
 
 
+async def fetch_bytes_url(url: str, descripcion: str | None = None) -> bytes:
+    """Descarga el contenido binario de una URL (archivos tar.gz de avisos, etc.).
 
+    Args:
+        url: URL del recurso.
+        descripcion: Texto opcional para contextualizar errores.
+
+    Raises:
+        AemetError: Si la descarga falla.
+    """
+    import httpx
+
+    contexto = f" ({descripcion})" if descripcion else ""
+    try:
+        async with httpx.AsyncClient() as client:
+            resp = await client.get(url, timeout=30)
+            resp.raise_for_status()
+    except httpx.HTTPError as exc:
+        raise AemetError(f"Error descargando archivo{contexto}: {exc}")
+    anotar_peticion(bytes_datos=len(resp.content))
+    return resp.content
+
+
+async def descargar_en_streaming(url: str, destino, descripcion: str | None = None) -> int:
+    """Descarga una URL escribiendo el contenido en ``destino`` bloque a bloque.
+
+    El contenido nunca se carga entero en memoria, así que sirve para
+    descargas de cualquier tamaño.
+
+    Args:
+        url: URL del recurso.
+        destino: Objeto binario con método ``write``.
+        descripcion: Texto opcional para contextualizar errores.
+
+    Returns:
+        int: Bytes escritos.
+
+    Raises:
+        AemetError: Si la descarga falla.
+    """
+    import httpx
+
+    contexto = f" ({descripcion})" if descripcion else ""
+    escritos = 0
+    try:
+        async with httpx.AsyncClient() as client:
+            async with client.stream("GET", url, timeout=30) as resp:
+                resp.raise_for_status()
+                async for bloque in resp.aiter_bytes():
+                    destino.write(bloque)
+                    escritos += len(bloque)
+    except httpx.HTTPError as exc:
+        raise AemetError(f"Error descargando archivo{contexto}: {exc}")
+    anotar_peticion(bytes_datos=escritos)
+    return escritos
+
+
+
+
+async def fetch_con_reintentos_endpoint_aemet(url_template: str, tipo: str, api_keys: list[str], limitador=None):
+    import httpx
 
-async def fetch_con_reintentos_endpoint_aemet(url_template: str, tipo: str, api_keys: list[str]):
     print("Accediendo Base datos AEMET")
     ciclos_completados = 0
 
+    # Con limitador, el primer intento va a la clave que antes tenga cuota
+    # libre (ya reservada), para repartir la carga entre todas las claves.
+    # Si falla, se sigue con el resto en orden.
+    primera = None
+    if limitador is not None and hasattr(limitador, "adquirir_cualquiera"):
+        with medir("cuota"):
+            primera = await limitador.adquirir_cualquiera()
+        if primera >= len(api_keys):
+            primera = None
+
     while ciclos_completados < MAX_CICLOS:
         print(f"🔄 Ciclo {ciclos_completados + 1} de {MAX_CICLOS}")
 
-        for key_index, api_key in enumerate(api_keys):
+        orden = list(range(len(api_keys)))
+        if primera is not None and ciclos_completados == 0:
+            orden.remove(primera)
+            orden.insert(0, primera)
+        for posicion, key_index in enumerate(orden):
+            api_key = api_keys[key_index]
             endpoint = url_template.replace("{apiKey}", api_key)
             print(f"Probando endpoint: {endpoint}")
+            ya_reservada = primera is not None and ciclos_completados == 0 and posicion == 0
+            if limitador is not None and not ya_reservada:
+                # Respeta la cuota de la clave (compartida entre procesos).
+                with medir("cuota"):
+                    await limitador.adquirir(key_index)
 
             async with httpx.AsyncClient() as client:
                 try:
                     resp = await client.get(endpoint, timeout=10)
+                    anotar_peticion(bytes_metadatos=len(resp.content))
+                    if resp.status_code == 404 and "application/json" in resp.headers.get("Content-Type", ""):
+                        # "No hay datos que satisfagan esos criterios": definitivo,
+                        # no tiene sentido reintentar con otras claves.
+                        data = _decodificar_json(resp)
+                        if isinstance(data, dict) and data.get("estado") == 404:
+                            print(f"ℹ️ AEMET no tiene datos ({tipo}): {data.get('descripcion', '')}")
+                            return data
                     resp.raise_for_status()
 
                     if "application/json" not in resp.headers.get("Content-Type", ""):
@@ -66,7 +178,7 @@ async def fetch_con_reintentos_endpoint_aemet(url_template: str, tipo: str, api_
                         continue
 
                     try:
-                        data = resp.json()
+                        data = _decodificar_json(resp)
                     except Exception as decode_error:
                         print(f"❗ Error decodificando JSON con la clave {key_index + 1}. Primeros 200 chars: {resp.text[:200]}")
                         raise decode_error
@@ -79,9 +191,10 @@ async def fetch_con_reintentos_endpoint_aemet(url_template: str, tipo: str, api_
                 except Exception as e:
                     print(f"❗ Error con la clave {key_index + 1} ({tipo}): {e}")
 
-                espera = min(1 * (2 ** key_index), 30)
+                espera = min(1 * (2 ** posicion), 30)
                 print(f"⏳ Esperando {espera} segundos antes de probar la siguiente clave...")
-                await asyncio.sleep(espera)
+                with medir("espera"):
+                    await asyncio.sleep(espera)
 
         ciclos_completados += 1
         print(f"➡️ Terminó ciclo {ciclos_completados}.")
@@ -89,6 +202,60 @@ async def fetch_con_reintentos_endpoint_aemet(url_template: str, tipo: str, api_
     raise AemetError(f"No se pudo realizar la solicitud tras {MAX_CICLOS} ciclos.")
 
 
+async def obtener_url_datos(
+    url_template: str,
+    tipo: str,
+    api_keys: list[str],
+    limitador=None,
+    cobertura=None,
+) -> str:
+    """Primer paso de toda consulta: resuelve la URL de ``datos`` de AEMET.
+
+    Args:
+        url_template: URL del endpoint con el marcador ``{apiKey}``.
+        tipo: Etiqueta de la consulta para los mensajes.
+        api_keys: Claves API de AEMET.
+        limitador: Objeto opcional con ``adquirir(indice_clave)`` que limita
+            el ritmo de peticiones por clave. Si además tiene
+            ``adquirir_cualquiera()``, el primer intento usa la clave con
+            cuota libre más próxima.
+        cobertura: ``Cobertura`` opcional; si se indica, las peticiones lentas
+            se duplican con otra clave (ver :mod:`aemetdata.utils.cobertura`).
+
+    Returns:
+        str: URL de descarga de los datos.
+
+    Raises:
+        AemetSinDatos: Si AEMET responde que no hay datos (estado 404).
+        AemetError: Si AEMET responde con otro estado distinto de 200 o sin URL.
+    """
+    if cobertura is not None:
+        from .cobertura import fetch_con_cobertura
+
+        response = await fetch_con_cobertura(
+            url_template, tipo, api_keys, cobertura, limitador=limitador
+        )
+    else:
+        response = await fetch_con_reintentos_endpoint_aemet(
+            url_template, tipo=tipo, api_keys=api_keys, limitador=limitador
+        )
+    if not isinstance(response, dict):
+        raise AemetError(f"Respuesta inesperada de AEMET: {response}")
+    if response.get("estado") == 404:
+        raise AemetSinDatos(
+            f"Sin datos en AEMET: {response.get('descripcion', 'Error desconocido')} ({tipo})"
+        )
+    if response.get("estado") != 200:
+        raise AemetError(
+            f"Error en AEMET: {response.get('descripcion', 'Error desconocido')} "
+            f"(estado: {response.get('estado')})"
+        )
+    datos_url = response.get("datos")
+    if not datos_url:
+        raise AemetError("No se encontró URL de descarga en la respuesta de AEMET")
+    return datos_url
+
+
 async def descargar_archivo_tar_gz(url: str) -> dict:
     """Descarga un archivo desde una URL y extrae su contenido.
     
@@ -104,6 +271,8 @@ async def descargar_archivo_tar_gz(url: str) -> dict:
         AemetError: Si hay error descargando o extrayendo el archivo.
     """
     import zipfile
+
+    import httpx
     
     print(f"📥 Descargando archivo desde: {url}")
     
@@ -111,6 +280,7 @@ async def descargar_archivo_tar_gz(url: str) -> dict:
         async with httpx.AsyncClient() as client:
             resp = await client.get(url, timeout=30)
             resp.raise_for_status()
+            anotar_peticion(bytes_datos=len(resp.content))
             
             print(f"✔️ Archivo descargado ({len(resp.content)} bytes)")
             
@@ -0,0 +1,132 @@
+"""Benchmark del tiempo de importación de aemetdata.
+
+Lanza intérpretes nuevos para medir ``import aemetdata`` y ``aemetdata.cli
+--list`` y falla (código de salida 1) si se supera el presupuesto o si
+cualquiera de los dos carga dependencias pesadas que deberían ser perezosas.
+
+Uso:
+    python benchmarks/bench_import.py [--repeticiones 10] [--presupuesto-ms 15] [--presupuesto-cli-ms 25]
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Módulos que no deben cargarse con ``import aemetdata`` ni con ``aemetdata.cli --list``.
+MODULOS_PROHIBIDOS = [
+    "httpx",
+    "dateutil",
+    "aemetdata.avisos",
+    "aemetdata.climatologia",
+    "aemetdata.predicciones",
+]
+
+# Ejecuta ``aemetdata.cli --list`` como ``python -m`` y, al terminar, imprime
+# en la última línea los módulos prohibidos que se hayan cargado.
+_CODIGO_CLI = f"""
+import runpy, sys
+sys.argv = ["aemetdata.cli", "--list"]
+try:
+    runpy.run_module("aemetdata.cli", run_name="__main__", alter_sys=True)
+except SystemExit:
+    pass
+print(",".join(m for m in {MODULOS_PROHIBIDOS!r} if m in sys.modules))
+"""
+
+
+def _ejecutar(argumentos):
+    entorno = dict(os.environ, PYTHONPATH=RAIZ)
+    inicio = time.perf_counter()
+    proceso = subprocess.run(
+        [sys.executable, *argumentos],
+        cwd=RAIZ,
+        env=entorno,
+        capture_output=True,
+        text=True,
+    )
+    transcurrido = time.perf_counter() - inicio
+    if proceso.returncode != 0:
+        raise RuntimeError(f"Falló {' '.join(argumentos)}:\n{proceso.stderr}")
+    return proceso, transcurrido
+
+
+def tiempo_import_aemetdata_us():
+    """Tiempo acumulado de ``import aemetdata`` según ``-X importtime``, en µs."""
+    proceso, _ = _ejecutar(["-X", "importtime", "-c", "import aemetdata"])
+    for linea in proceso.stderr.splitlines():
+        coincidencia = re.match(r"import time:\s+\d+ \|\s+(\d+) \| aemetdata$", linea)
+        if coincidencia:
+            return int(coincidencia.group(1))
+    raise RuntimeError("No se encontró la línea de 'aemetdata' en la salida de -X importtime.")
+
+
+def modulos_cargados():
+    codigo = (
+        "import sys, aemetdata; "
+        f"print(','.join(m for m in {MODULOS_PROHIBIDOS!r} if m in sys.modules))"
+    )
+    proceso, _ = _ejecutar(["-c", codigo])
+    return [m for m in proceso.stdout.strip().split(",") if m]
+
+
+def modulos_cargados_cli():
+    proceso, _ = _ejecutar(["-c", _CODIGO_CLI])
+    ultima = proceso.stdout.strip().splitlines()[-1] if proceso.stdout.strip() else ""
+    return [m for m in ultima.split(",") if m in MODULOS_PROHIBIDOS]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeticiones", type=int, default=10)
+    parser.add_argument(
+        "--presupuesto-ms",
+        type=float,
+        default=15.0,
+        help="Máximo permitido para 'import aemetdata' (mejor de N ejecuciones).",
+    )
+    parser.add_argument(
+        "--presupuesto-cli-ms",
+        type=float,
+        default=25.0,
+        help="Máximo permitido para 'aemetdata.cli --list' por encima del intérprete vacío.",
+    )
+    args = parser.parse_args()
+
+    cargados = modulos_cargados()
+    cargados_cli = modulos_cargados_cli()
+    import_ms = min(tiempo_import_aemetdata_us() for _ in range(args.repeticiones)) / 1000
+    base_s = min(_ejecutar(["-c", "pass"])[1] for _ in range(args.repeticiones))
+    cli_s = min(_ejecutar(["-m", "aemetdata.cli", "--list"])[1] for _ in range(args.repeticiones))
+
+    print(f"import aemetdata:        {import_ms:8.2f} ms")
+    extra_cli_ms = (cli_s - base_s) * 1000
+    print(
+        f"aemetdata.cli --list:    {cli_s * 1000:8.2f} ms "
+        f"(intérprete vacío: {base_s * 1000:.2f} ms, +{extra_cli_ms:.2f} ms)"
+    )
+
+    errores = []
+    if cargados:
+        errores.append(f"'import aemetdata' carga módulos que deberían ser perezosos: {', '.join(cargados)}")
+    if import_ms > args.presupuesto_ms:
+        errores.append(f"'import aemetdata' tarda {import_ms:.2f} ms (presupuesto {args.presupuesto_ms} ms)")
+    if cargados_cli:
+        errores.append(f"'aemetdata.cli --list' carga módulos que deberían ser perezosos: {', '.join(cargados_cli)}")
+    if extra_cli_ms > args.presupuesto_cli_ms:
+        errores.append(
+            f"'aemetdata.cli --list' tarda {extra_cli_ms:.2f} ms más que el intérprete vacío "
+            f"(presupuesto {args.presupuesto_cli_ms} ms)"
+        )
+    for error in errores:
+        print(f"❗ {error}")
+    return 1 if errores else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())